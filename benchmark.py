@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import random
+import time
+
+import numpy as np
+
+from constants import KPI_CONSEC_1, KPI_CONSEC_2, KPI_OVERLOAD_1, KPI_OVERLOAD_2, KPI_OVERLOAD_3, KPI_OVERLOAD_4, \
+    KPI_EXAM_DURA
+from new import GAOptimizer
+from options import EvaluationOptions
+
+# instance sizes: students, modules, registrations per student, rooms, exam days
+SIZES = {
+    "small": dict(n_students=500, n_modules=40, regs_per_student=4, n_rooms=4, n_days=10),
+    "medium": dict(n_students=3000, n_modules=150, regs_per_student=5, n_rooms=6, n_days=15),
+    "large": dict(n_students=15000, n_modules=500, regs_per_student=6, n_rooms=10, n_days=20),
+}
+
+KPI_COEF = {KPI_CONSEC_1: -1, KPI_CONSEC_2: -5, KPI_OVERLOAD_1: -1, KPI_OVERLOAD_2: -5,
+            KPI_OVERLOAD_3: -70, KPI_OVERLOAD_4: -100, KPI_EXAM_DURA: -200}
+
+
+def generate_instance(directory, n_students=1000, n_modules=80, regs_per_student=5, n_rooms=5, n_days=15, seed=0):
+    """write a synthetic registration file and spatio-time table to directory, return the inputs of
+    GAOptimizer.initialize as a dict
+
+    Module popularity follows a Zipf-like law and each student takes about regs_per_student modules. Exam days are
+    the weekdays from day 1 on, each with an "am" and a "pm" slot, and about one room slot in ten is unavailable.
+    Room capacities are spread evenly from the size of the most popular module down. The same seed always gives the
+    same files.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    modules = [f"MOD{i:04d}" for i in range(n_modules)]
+    students = [f"S{i:06d}" for i in range(n_students)]
+
+    popularity = 1 / np.arange(1, n_modules + 1) ** 0.8
+    popularity /= popularity.sum()
+    registrations = np.zeros((n_students, n_modules), dtype=np.int8)
+    counts = np.clip(rng.poisson(regs_per_student, n_students), 1, n_modules)
+    for s, count in enumerate(counts):
+        registrations[s, rng.choice(n_modules, count, replace=False, p=popularity)] = 1
+    regis_file = os.path.join(directory, "registration.csv")
+    with open(regis_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID"] + modules)
+        for student, row in zip(students, registrations.tolist()):
+            writer.writerow([student] + row)
+
+    rooms = [f"R{i:03d}" for i in range(n_rooms)]
+    largest = int(registrations.sum(axis=0).max())
+    room_caps = {room: int(cap) for room, cap in zip(rooms, np.linspace(largest, max(largest // 8, 10), n_rooms))}
+    days = [day for day in range(1, 7 * n_days) if day % 7 not in (6, 0)][:n_days]
+    spatime_file = os.path.join(directory, "spatio_time.csv")
+    with open(spatime_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["day", "week", "slot"] + rooms)
+        for day in days:
+            for slot in ("am", "pm"):
+                # an empty cell is an available room slot
+                writer.writerow([day, day // 7 + 1, slot] + ["x" if rng.random() < 0.1 else "" for _ in rooms])
+
+    fixed_exams = {modules[-1]: (days[1], "am", rooms[-1])}
+    return dict(spatime_file=spatime_file, rooms=rooms, room_caps=room_caps, fixed_exams=fixed_exams,
+                regis_datafile=regis_file)
+
+
+def time_stage(func, repeats):
+    """best and mean wall time of repeats calls of func, with the result of the last call"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times), result
+
+
+def benchmark_instance(instance, repeats=3, n_individuals=50, engines=("python", "numpy", "delta"),
+                       ga_engine="numpy", ga_generations=20, pop_size=50, seed=0):
+    """time each stage on one instance, return one record per stage
+
+    Stages are load (spatio-time table and registrations), conflict, bindings, evaluate_<engine> (seconds per
+    evaluation, over n_individuals random chromosomes; for "delta" over mutated copies of evaluated ones) and ga
+    (a full run of ga_generations generations).
+    """
+    opt = GAOptimizer()
+    opt.fixed_exams = instance["fixed_exams"]
+    opt.room_caps = instance["room_caps"]
+
+    def load():
+        opt.process_spatio_time_data(instance["spatime_file"], instance["rooms"])
+        opt.process_register_data(instance["regis_datafile"])
+
+    records = []
+
+    def record(stage, best, mean, per=1):
+        records.append({"stage": stage, "best_s": best / per, "mean_s": mean / per, "repeats": repeats})
+
+    record("load", *time_stage(load, repeats)[:2])
+    record("conflict", *time_stage(opt.check_conflict, repeats)[:2])
+    record("bindings", *time_stage(opt.generate_bindings, repeats)[:2])
+
+    for engine in engines:
+        toolbox = opt.build_toolbox(KPI_COEF, engine)
+        random.seed(seed)
+        population = toolbox.population(n=n_individuals)
+        if engine == "delta":
+            for ind in population:
+                ind.fitness.values = toolbox.evaluate(ind)
+
+            def evaluate_all():
+                children = [toolbox.mutate(toolbox.clone(ind))[0] for ind in population]
+                start = time.perf_counter()
+                for child in children:
+                    toolbox.evaluate(child)
+                return time.perf_counter() - start
+
+            times = [evaluate_all() for _ in range(repeats)]
+            record(f"evaluate_{engine}", min(times), sum(times) / len(times), n_individuals)
+        else:
+            best, mean, _ = time_stage(lambda: [toolbox.evaluate(ind) for ind in population], repeats)
+            record(f"evaluate_{engine}", best, mean, n_individuals)
+        if engine == "numpy":
+            toolbox = opt.build_toolbox(KPI_COEF, engine, batch=True)
+            best, mean, _ = time_stage(lambda: toolbox.evaluate_batch(population), repeats)
+            record("evaluate_numpy_batch", best, mean, n_individuals)
+
+    def run_ga():
+        random.seed(seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            opt.optimize(KPI_COEF, pop_size=pop_size, mutation_rate=0.4, num_generation=ga_generations,
+                         evaluation=EvaluationOptions(ga_engine, batch=ga_engine == "numpy"))
+        return opt.ga_log[-1]["best"][0]
+
+    best, mean, fitness = time_stage(run_ga, repeats)
+    record(f"ga_{ga_engine}", best, mean)
+    records[-1]["best_fitness"] = fitness
+    return records
+
+
+def run_benchmark(sizes=("small",), out="benchmark_results", repeats=3, seed=0, **kwargs):
+    """benchmark every instance size (a name of SIZES or a dict of generate_instance parameters) and write the
+    records to <out>.json (with the environment) and <out>.csv"""
+    results = []
+    for size in sizes:
+        params = SIZES[size] if isinstance(size, str) else dict(size)
+        name = size if isinstance(size, str) else "custom"
+        instance = generate_instance(os.path.join(out + "_instances", name), seed=seed, **params)
+        for rec in benchmark_instance(instance, repeats=repeats, seed=seed, **kwargs):
+            results.append({"size": name, **params, **rec})
+            print(f"{name:>8} {rec['stage']:>22} {rec['best_s']:.6f}s")
+
+    environment = {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+                   "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": seed}
+    with open(out + ".json", "w") as f:
+        json.dump({"environment": environment, "results": results}, f, indent=2)
+    fields = list(dict.fromkeys(key for rec in results for key in rec))
+    with open(out + ".csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        writer.writerows(results)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="time the stages of the exam timetabling GA on synthetic data")
+    parser.add_argument("--sizes", nargs="+", default=["small"], choices=list(SIZES))
+    parser.add_argument("--out", default="benchmark_results", help="results are written to OUT.json and OUT.csv")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--generations", type=int, default=20, help="generations of the full GA run")
+    parser.add_argument("--engines", nargs="+", default=["python", "numpy", "delta"],
+                        choices=["python", "numpy", "delta"])
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.out, args.repeats, args.seed, engines=args.engines,
+                  ga_generations=args.generations)
@@ -0,0 +1,212 @@
+import argparse
+import contextlib
+import json
+import sys
+
+CONFIG_HELP = """\
+The inputs are given as options or in a JSON config file (options win), whose keys are the option names with
+underscores, e.g. {"spatime_file": ..., "rooms": [...], "room_caps": {room: capacity}, "regis_datafile": ...,
+"id_col": "CID", "fixed_exams": {exam: [day, slot, room]}, "kpi_coef": {kpi: coef}, "pop_size": 100}. The config
+may also set any GA option of options.FLAT_OPTIONS, e.g. "stagnation", "max_evaluations", "memetic_every" or
+"warm_start"."""
+# config keys besides the GA options
+SETTINGS = ("spatime_file", "rooms", "room_caps", "regis_datafile", "id_col", "exam_col", "cache_dir", "kpi_coef",
+            "fixed_exams", "bindings", "seed", "out", "student_table", "timetable", "print")
+
+GA_DEFAULTS = {"pop_size": 100, "crossover_rate": 0, "mutation_rate": 0.4, "num_generation": 800,
+               "engine": "numpy", "batch": False}
+
+
+def _room_cap(text):
+    room, _, cap = text.partition("=")
+    if not cap:
+        raise argparse.ArgumentTypeError(f"expected ROOM=CAPACITY, got {text}")
+    return room, int(cap)
+
+
+def load_settings(args):
+    """the config file, if any, updated with the options given on the command line"""
+    from constants import KPI_SET
+    from options import FLAT_OPTIONS, GA_PARAMETERS
+
+    settings = {}
+    if args.config is not None:
+        with open(args.config) as f:
+            settings = json.load(f)
+        unknown = set(settings) - set(SETTINGS) - set(GA_PARAMETERS) - set(FLAT_OPTIONS)
+        if unknown:
+            sys.exit(f"unknown config keys: {', '.join(sorted(unknown))}")
+    for key, value in vars(args).items():
+        if value is None or key in ("config", "command", "func"):
+            continue
+        if key == "room_caps":
+            # --room-cap adds to or overrides the capacities of the config
+            value = {**settings.get("room_caps", {}), **dict(value)}
+        elif key == "kpi_coef":
+            value = json.loads(value)
+        settings[key] = value
+    if "kpi_coef" in settings:
+        # KPIs left out are not weighted
+        settings["kpi_coef"] = {**{kpi: 0 for kpi in KPI_SET}, **settings["kpi_coef"]}
+    settings["fixed_exams"] = {exam: tuple(spats) for exam, spats in (settings.get("fixed_exams") or {}).items()}
+    missing = [key for key in ("spatime_file", "rooms", "room_caps", "regis_datafile") if not settings.get(key)]
+    if missing:
+        sys.exit(f"missing inputs: {', '.join(missing)} (give them as options or in --config)")
+    return settings
+
+
+def load_optimizer(settings):
+    from new import GAOptimizer
+
+    optimizer = GAOptimizer()
+    optimizer.initialize(settings["spatime_file"], settings["rooms"], settings["room_caps"], settings["fixed_exams"],
+                         settings["regis_datafile"], id_col=settings.get("id_col", "ID"),
+                         exam_col=settings.get("exam_col"), cache_dir=settings.get("cache_dir"))
+    return optimizer
+
+
+def load_timetable(optimizer, settings):
+    """exam2spats of the --timetable file, restricted to the registered exams, the fixed ones taking their slot"""
+    from warm_start import read_timetable
+
+    if not settings.get("timetable"):
+        sys.exit("missing input: timetable")
+    exam2spats = {exam: spats for exam, spats in read_timetable(settings["timetable"], settings["rooms"]).items()
+                  if exam in optimizer.exam2students}
+    exam2spats.update(optimizer.fixed_exams)
+    missing = sorted(set(optimizer.exam2students) - set(exam2spats))
+    if missing:
+        sys.exit(f"{len(missing)} registered exams are not in the timetable: {', '.join(map(str, missing[:10]))}")
+    optimizer.exam2spats = exam2spats
+    return exam2spats
+
+
+def print_json(data):
+    from export import json_default
+
+    print(json.dumps(data, indent=2, default=json_default))
+
+
+def to_stderr():
+    """send what the optimizer prints (GA log, violations) to stderr, keeping stdout for the JSON result"""
+    return contextlib.redirect_stdout(sys.stderr)
+
+
+def optimize(args):
+    import random
+
+    from options import optimize_arguments
+
+    settings = load_settings(args)
+    if "kpi_coef" not in settings:
+        sys.exit("missing input: kpi_coef")
+    ga_options = {**GA_DEFAULTS, **{key: value for key, value in settings.items() if key not in SETTINGS}}
+    if ga_options["batch"] and ga_options["engine"] != "numpy":
+        sys.exit("batch requires the numpy engine")
+    optimizer = load_optimizer(settings)
+    if settings.get("bindings"):
+        optimizer.generate_bindings(settings["bindings"])
+    random.seed(settings.get("seed"))
+    with to_stderr():
+        optimizer.optimize(settings["kpi_coef"], **optimize_arguments(**ga_options))
+        feasible, cap_feasible, time_feasible = optimizer.get_feasibility()
+    optimizer.output_table(settings.get("out", "./data/optimized_table.csv"))
+    if settings.get("student_table"):
+        optimizer.output_student_table(settings["student_table"])
+    print_json({"best_fitness": optimizer.best_fitness, "stop": optimizer.stop_reason,
+                "feasible": feasible, "cap_feasible": cap_feasible, "time_feasible": time_feasible,
+                "kpis": optimizer.get_kpis()})
+
+
+def evaluate(args):
+    settings = load_settings(args)
+    optimizer = load_optimizer(settings)
+    load_timetable(optimizer, settings)
+    kpis = optimizer.get_kpis()
+    with to_stderr():
+        feasible, cap_feasible, time_feasible = optimizer.get_feasibility()
+    result = {"feasible": feasible, "cap_feasible": cap_feasible, "time_feasible": time_feasible, "kpis": kpis}
+    if "kpi_coef" in settings:
+        result["weighted_kpis"] = sum(coef * kpis[kpi] for kpi, coef in settings["kpi_coef"].items())
+    print_json(result)
+
+
+def report(args):
+    settings = load_settings(args)
+    optimizer = load_optimizer(settings)
+    exam2spats = load_timetable(optimizer, settings)
+    optimizer.output_student_table(settings.get("student_table", "student_table.csv"))
+    if settings.get("print"):
+        from prettytable import PrettyTable
+
+        table = PrettyTable(["Module", "Day", "Slot", "Room"])
+        table.add_rows([[exam, *spats] for exam, spats in sorted(exam2spats.items(), key=lambda item: item[1][:2])])
+        print(table)
+
+
+def check_feasibility(args):
+    """list the violations of the timetable on stderr, exit with status 1 if there is any"""
+    settings = load_settings(args)
+    optimizer = load_optimizer(settings)
+    load_timetable(optimizer, settings)
+    with to_stderr():
+        feasible, cap_feasible, time_feasible = optimizer.get_feasibility()
+    print_json({"feasible": feasible, "cap_feasible": cap_feasible, "time_feasible": time_feasible})
+    return 0 if feasible else 1
+
+
+def build_parser():
+    # the optimizer and its dependencies are only imported by the commands, so that --help and argument errors
+    # are fast
+    parser = argparse.ArgumentParser(description="exam timetabling with a genetic algorithm", epilog=CONFIG_HELP,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    inputs = argparse.ArgumentParser(add_help=False)
+    inputs.add_argument("--config", help="JSON file of settings, overridden by the options")
+    inputs.add_argument("--spatime", dest="spatime_file", help="spatio-time table (CSV)")
+    inputs.add_argument("--registration", dest="regis_datafile", help="registration data (CSV)")
+    inputs.add_argument("--rooms", nargs="+")
+    inputs.add_argument("--room-cap", dest="room_caps", type=_room_cap, action="append", metavar="ROOM=CAPACITY")
+    inputs.add_argument("--id-col")
+    inputs.add_argument("--exam-col", help="exam column of a long registration table (one registration per row)")
+    inputs.add_argument("--cache-dir", help="directory of the preprocessing cache")
+    inputs.add_argument("--kpi-coef", help="KPI coefficients as a JSON object")
+    timetable = argparse.ArgumentParser(add_help=False)
+    timetable.add_argument("--timetable", help="timetable written by optimize (output_table)")
+
+    command = subparsers.add_parser("optimize", parents=[inputs], help="run the GA and write the best timetable")
+    command.add_argument("--pop-size", type=int)
+    command.add_argument("--num-generation", type=int)
+    command.add_argument("--mutation-rate", type=float)
+    command.add_argument("--crossover-rate", type=float)
+    command.add_argument("--engine", choices=("python", "numpy", "delta"))
+    command.add_argument("--batch", action="store_true", default=None,
+                         help="score each generation in one vectorized pass (numpy engine)")
+    command.add_argument("--bindings", choices=("pairs", "dsatur"))
+    command.add_argument("--seed", type=int)
+    command.add_argument("--out", help="timetable path (.csv or .parquet)")
+    command.add_argument("--student-table", help="also write the per-student KPI table there")
+    command.set_defaults(func=optimize)
+
+    command = subparsers.add_parser("evaluate", parents=[inputs, timetable], help="KPIs and feasibility of a timetable")
+    command.set_defaults(func=evaluate)
+
+    command = subparsers.add_parser("report", parents=[inputs, timetable], help="per-student KPI table of a timetable")
+    command.add_argument("--student-table", help="path of the table (default student_table.csv)")
+    command.add_argument("--print", action="store_true", default=None, help="also print the timetable")
+    command.set_defaults(func=report)
+
+    command = subparsers.add_parser("check-feasibility", parents=[inputs, timetable],
+                                    help="list capacity and conflict violations on stderr, exit status 1 if there "
+                                         "is any")
+    command.set_defaults(func=check_feasibility)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
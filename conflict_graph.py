@@ -0,0 +1,143 @@
+import numpy as np
+
+
+class ConflictGraph:
+    """Exam conflict graph, built in one pass over the registrations.
+
+    Two exams conflict when at least one student registered for both. The graph is kept as packed bitsets (one row of
+    bits per exam, for O(1) conflict queries) and as a symmetric sparse co-enrolment matrix in CSR form (adjacency
+    lists with the number of shared students). Exams are indexed in the order they are given.
+    """
+
+    def __init__(self, exams, student2exams: dict):
+        self.exams = list(exams)
+        self.index = {exam: i for i, exam in enumerate(self.exams)}
+        num_exams = len(self.exams)
+
+        # registrations grouped by student, as exam indices
+        reg_exam = [self.index[exam] for registered_exams in student2exams.values() for exam in registered_exams
+                    if exam in self.index]
+        reg_student = [s for s, registered_exams in enumerate(student2exams.values()) for exam in registered_exams
+                       if exam in self.index]
+        reg_exam = np.array(reg_exam, dtype=np.int64)
+        reg_student = np.array(reg_student, dtype=np.int64)
+
+        # co-enrolled exam pairs: registrations `offset` apart that belong to the same student
+        max_regs = np.bincount(reg_student).max() if len(reg_student) else 0
+        pair_keys = []
+        for offset in range(1, max_regs):
+            same_student = reg_student[offset:] == reg_student[:-offset]
+            exam_1, exam_2 = reg_exam[:-offset][same_student], reg_exam[offset:][same_student]
+            pair_keys.append(np.minimum(exam_1, exam_2) * num_exams + np.maximum(exam_1, exam_2))
+        pair_keys = np.concatenate(pair_keys) if pair_keys else np.zeros(0, dtype=np.int64)
+        pair_keys, shared = np.unique(pair_keys, return_counts=True)
+        # edges sorted by (exam_1, exam_2) with exam_1 < exam_2, i.e. in itertools.combinations order
+        self.edge_1, self.edge_2 = pair_keys // num_exams, pair_keys % num_exams
+        self.edge_shared = shared
+
+        self.bits = np.zeros((num_exams, (num_exams + 7) // 8), dtype=np.uint8)
+        for rows, cols in ((self.edge_1, self.edge_2), (self.edge_2, self.edge_1)):
+            np.bitwise_or.at(self.bits, (rows, cols >> 3), (0x80 >> (cols & 7)).astype(np.uint8))
+
+        rows = np.concatenate((self.edge_1, self.edge_2))
+        cols = np.concatenate((self.edge_2, self.edge_1))
+        order = np.lexsort((cols, rows))
+        self.adj_ptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=num_exams))))
+        self.adj_exams = cols[order]
+        self.adj_shared = np.concatenate((shared, shared))[order]
+
+    # the arrays that make up the graph, besides the exam list
+    ARRAYS = ("edge_1", "edge_2", "edge_shared", "bits", "adj_ptr", "adj_exams", "adj_shared")
+
+    @classmethod
+    def from_arrays(cls, exams, arrays):
+        """graph rebuilt from its exam list and a mapping with the ARRAYS, e.g. loaded from a PreprocessCache"""
+        graph = cls.__new__(cls)
+        graph.exams = list(exams)
+        graph.index = {exam: i for i, exam in enumerate(graph.exams)}
+        for name in cls.ARRAYS:
+            setattr(graph, name, arrays[name])
+        return graph
+
+    def __len__(self):
+        return len(self.exams)
+
+    def conflicts(self, exam_1, exam_2):
+        """whether two exams share at least one student (exams unknown to the graph conflict with nothing)"""
+        i, j = self.index.get(exam_1), self.index.get(exam_2)
+        if i is None or j is None:
+            return False
+        return bool(self.bits[i, j >> 3] & (0x80 >> (j & 7)))
+
+    def conflict_row(self, i):
+        """boolean mask of the exams conflicting with exam index i"""
+        return np.unpackbits(self.bits[i], count=len(self.exams)).astype(bool)
+
+    def neighbors(self, exam):
+        i = self.index[exam]
+        return [self.exams[j] for j in self.adj_exams[self.adj_ptr[i]:self.adj_ptr[i + 1]]]
+
+    def degree(self, exam):
+        i = self.index[exam]
+        return int(self.adj_ptr[i + 1] - self.adj_ptr[i])
+
+    def shared_students(self, exam_1, exam_2):
+        i, j = self.index[exam_1], self.index[exam_2]
+        row = self.adj_exams[self.adj_ptr[i]:self.adj_ptr[i + 1]]
+        k = np.searchsorted(row, j)
+        return int(self.adj_shared[self.adj_ptr[i] + k]) if k < len(row) and row[k] == j else 0
+
+    def edges(self):
+        """conflicting exam pairs, in the order itertools.combinations would visit them"""
+        for i, j in zip(self.edge_1.tolist(), self.edge_2.tolist()):
+            yield self.exams[i], self.exams[j]
+
+    def first_compatible(self, i, candidates):
+        """index of the first candidate exam after i that does not conflict with exam i, or None"""
+        mask = candidates & ~self.conflict_row(i)
+        mask[:i + 1] = False
+        j = int(np.argmax(mask))
+        return j if mask[j] else None
+
+
+def dsatur_groups(graph: ConflictGraph, sizes, capacity, fixed_capacity: dict):
+    """group the exams of the graph into independent sets with the DSATUR colouring heuristic
+
+    sizes[i] is the number of students of exam i and the total size of a group must not exceed capacity, except for
+    the group of a fixed exam i, bounded by fixed_capacity[i] instead. Fixed exams are pre-coloured, one per group.
+    A lone exam larger than the capacity still gets a group of its own. Returns the groups as lists of exam indices.
+    """
+    num_exams = len(graph)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    degree = np.diff(graph.adj_ptr)
+    groups, loads, caps = [], [], []
+    neighbour_groups = [set() for _ in range(num_exams)]  # groups already used by the neighbours of each exam
+    saturation = np.zeros(num_exams, dtype=np.int64)  # number of such groups
+    uncoloured = np.ones(num_exams, dtype=bool)
+
+    def assign(i, g):
+        if g == len(groups):
+            groups.append([])
+            loads.append(0)
+            caps.append(capacity)
+        groups[g].append(i)
+        loads[g] += sizes[i]
+        uncoloured[i] = False
+        for j in graph.adj_exams[graph.adj_ptr[i]:graph.adj_ptr[i + 1]].tolist():
+            if g not in neighbour_groups[j]:
+                neighbour_groups[j].add(g)
+                saturation[j] += 1
+
+    for i, cap in fixed_capacity.items():
+        assign(i, len(groups))
+        caps[-1] = cap
+
+    # pick the exam with the most distinct neighbouring groups, then the highest degree, then the most students
+    scale = sizes.max(initial=0) + 1
+    while uncoloured.any():
+        priority = (saturation * (num_exams + 1) + degree) * scale + sizes
+        i = int(np.argmax(np.where(uncoloured, priority, -1)))
+        g = next((g for g in range(len(groups))
+                  if g not in neighbour_groups[i] and loads[g] + sizes[i] <= caps[g]), len(groups))
+        assign(i, g)
+    return groups
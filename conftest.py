@@ -0,0 +1,20 @@
+import pytest
+
+from benchmark import generate_instance
+from new import GAOptimizer
+
+
+@pytest.fixture(scope="session")
+def instance(tmp_path_factory):
+    """inputs of GAOptimizer.initialize for a small synthetic instance (see benchmark.generate_instance)"""
+    return generate_instance(tmp_path_factory.mktemp("instance"), n_students=300, n_modules=30, regs_per_student=4,
+                             n_rooms=4, n_days=10, seed=1)
+
+
+def make_optimizer(instance, bindings=None, **options):
+    opt = GAOptimizer()
+    opt.initialize(instance["spatime_file"], instance["rooms"], instance["room_caps"], dict(instance["fixed_exams"]),
+                   instance["regis_datafile"], **options)
+    if bindings is not None:
+        opt.generate_bindings(bindings)
+    return opt
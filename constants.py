@@ -0,0 +1,10 @@
+INF = 1e7
+NO_EXAM_PLACEHOLDER = "no exam"
+KPI_CONSEC_1 = "2 consecutive exams in a week"
+KPI_CONSEC_2 = "3 consecutive exams in a week"
+KPI_OVERLOAD_1 = "more than 1 exam in a day"
+KPI_OVERLOAD_2 = "more than 3 exams in a week"
+KPI_OVERLOAD_3 = "4 exams in a week"
+KPI_OVERLOAD_4 = "5 exams in a week"
+KPI_EXAM_DURA = "duration of the exam period"
+KPI_SET = (KPI_CONSEC_1, KPI_CONSEC_2, KPI_OVERLOAD_1, KPI_OVERLOAD_2, KPI_EXAM_DURA, KPI_OVERLOAD_3, KPI_OVERLOAD_4)
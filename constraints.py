@@ -0,0 +1,125 @@
+import random
+from functools import wraps
+
+import numpy as np
+
+
+class SlotConstraints:
+    """Capacity and conflict structure of the genes of a FastEvaluator, for operators that place exams.
+
+    A gene carries an exam together with the exams bound to it (its group), so a slot suits a gene when its room fits
+    every non-fixed exam of the group and no exam conflicting with the group sits at the same day and slot.
+    """
+
+    def __init__(self, evaluator):
+        self.evaluator = ev = evaluator
+        num_exams = len(ev.exams)
+        # members of every exam's group - itself plus the exams bound to it
+        self.members = [[e] for e in range(num_exams)]
+        for key, value in zip(ev.bound_keys.tolist(), ev.bound_values.tolist()):
+            self.members[value].append(key)
+        self.group_size = np.array([ev.exam_size[group][~ev.is_fixed[group]].max(initial=0)
+                                    for group in self.members], dtype=np.int64)
+        # conflict adjacency by evaluator exam index
+        rows = np.concatenate((ev.conflict_1, ev.conflict_2))
+        cols = np.concatenate((ev.conflict_2, ev.conflict_1))
+        order = np.argsort(rows, kind="stable")
+        self.adj_ptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=num_exams))))
+        self.adj_exams = cols[order]
+        self.group_degree = np.array([sum(self.adj_ptr[e + 1] - self.adj_ptr[e] for e in group)
+                                      for group in self.members], dtype=np.int64)
+        # the exam whose gene carries each exam
+        self.leader = np.arange(num_exams)
+        self.leader[ev.bound_keys] = ev.bound_values
+
+    def violating_exams(self, slot_of):
+        """non-fixed exams over their room capacity or at the same day and slot as a conflicting exam"""
+        ev = self.evaluator
+        placed = (slot_of >= 0) & ~ev.is_fixed
+        violating = placed & (ev.exam_size > ev.slot_cap[slot_of])
+        clash = ev.slot_time[slot_of[ev.conflict_1]] == ev.slot_time[slot_of[ev.conflict_2]]
+        violating[ev.conflict_1[clash]] = True
+        violating[ev.conflict_2[clash]] = True
+        return np.flatnonzero(violating & ~ev.is_fixed)
+
+    def feasible_slots(self, exam, slot_of):
+        """slots with room for the group of exam and no exam conflicting with it at the same day and slot"""
+        ev = self.evaluator
+        group = self.members[exam]
+        neighbours = np.concatenate([self.adj_exams[self.adj_ptr[e]:self.adj_ptr[e + 1]] for e in group])
+        neighbours = neighbours[(slot_of[neighbours] >= 0) & ~np.isin(neighbours, group)]
+        busy_times = ev.slot_time[slot_of[neighbours]]
+        fits = ev.slot_cap[:ev.num_slots] >= self.group_size[exam]
+        return np.flatnonzero(fits & ~np.isin(ev.slot_time[:ev.num_slots], busy_times))
+
+    def construct(self):
+        """a random chromosome built greedily - exams with the most conflicts and students first, each into a random
+        free slot where it fits (or any free slot if there is none)"""
+        return self.complete([-1] * self.evaluator.num_slots)
+
+    def complete(self, chromosome):
+        """fill a partial chromosome (gene ids, -1 for the free positions) the way construct does, keeping the genes
+        already placed"""
+        ev = self.evaluator
+        gene_exam = ev.gene_exam
+        num_free = int(np.count_nonzero(gene_exam < len(ev.exams)))
+        chromosome = np.array(chromosome, dtype=np.int64)
+        slot_of = np.full(len(ev.exams), -1, dtype=np.int64)
+        for exam, slot in zip(ev.fixed_exam_ids.tolist(), ev.fixed_slot_ids.tolist()):
+            slot_of[self.members[exam]] = slot
+        for slot in np.flatnonzero(chromosome >= 0).tolist():
+            if chromosome[slot] < num_free:
+                slot_of[self.members[gene_exam[chromosome[slot]]]] = slot
+
+        missing = np.setdiff1d(np.arange(num_free), chromosome).tolist()
+        order = sorted(missing, key=lambda g: (-self.group_degree[gene_exam[g]], -self.group_size[gene_exam[g]],
+                                               random.random()))
+        for gene in order:
+            exam = gene_exam[gene]
+            free = chromosome < 0
+            candidates = self.feasible_slots(exam, slot_of)
+            candidates = candidates[free[candidates]]
+            if not len(candidates):
+                candidates = np.flatnonzero(free)
+            slot = random.choice(candidates.tolist())
+            chromosome[slot] = gene
+            slot_of[self.members[exam]] = slot
+
+        placeholders = np.setdiff1d(np.arange(num_free, ev.num_slots), chromosome).tolist()
+        random.shuffle(placeholders)
+        chromosome[chromosome < 0] = placeholders
+        return chromosome.tolist()
+
+    def repair(self, individual):
+        """move the genes of violating exams to free slots where they fit, in place"""
+        ev = self.evaluator
+        genes = np.asarray(individual)
+        gene_exam = ev.gene_exam[genes]
+        is_free = gene_exam == len(ev.exams)
+        slot_of = ev.resolve_slots([individual])[0]
+        leaders = np.unique(self.leader[self.violating_exams(slot_of)])
+        leaders = leaders[np.isin(leaders, gene_exam)].tolist()  # fixed exams have no gene
+        random.shuffle(leaders)
+        for exam in leaders:
+            p = slot_of[exam]
+            candidates = self.feasible_slots(exam, slot_of)
+            if p in candidates:
+                continue  # fixed by an earlier move
+            candidates = candidates[is_free[candidates]]
+            if not len(candidates):
+                continue
+            q = random.choice(candidates.tolist())
+            individual[p], individual[q] = individual[q], individual[p]
+            is_free[p], is_free[q] = True, False
+            slot_of[self.members[exam]] = q
+        return individual
+
+    def repaired(self, operator):
+        """decorator for mate/mutate, repairing the offspring they return"""
+        @wraps(operator)
+        def wrapper(*args, **kwargs):
+            offspring = operator(*args, **kwargs)
+            for child in offspring:
+                self.repair(child)
+            return offspring
+        return wrapper
@@ -0,0 +1,259 @@
+import os
+import pickle
+import random
+import time
+
+from deap import algorithms
+from deap import base
+from deap import tools
+
+
+def save_checkpoint(path, population, generation, halloffame, logbook, **extra):
+    """pickle the state of a run after `generation`, including the random state, so it can be resumed exactly
+
+    Individuals are saved without any evaluation cache they carry. The file is replaced atomically, so a run killed
+    while saving still leaves the previous checkpoint intact.
+    """
+    def strip(ind):
+        copy = type(ind)(ind)
+        copy.fitness.values = ind.fitness.values
+        return copy
+
+    if halloffame is not None:
+        hof_items = halloffame.items
+        halloffame.items = [strip(ind) for ind in hof_items]
+    state = dict(population=[strip(ind) for ind in population], generation=generation, halloffame=halloffame,
+                 logbook=logbook, rndstate=random.getstate(), **extra)
+    try:
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        if halloffame is not None:
+            halloffame.items = hof_items
+    os.replace(path + ".tmp", path)
+
+
+def load_checkpoint(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class StoppingCriteria:
+    """Early-stopping rules for ea_simple, checked after every generation.
+
+    stagnation: stop after this many generations without improving the best fitness
+    time_budget: stop once this many seconds of wall-clock time have been spent
+    target_fitness: stop as soon as an individual reaches this fitness
+    max_evaluations: stop once this many individuals have been evaluated
+    cancel_event: stop once this threading or multiprocessing Event is set, e.g. by another process
+    """
+
+    def __init__(self, stagnation=None, time_budget=None, target_fitness=None, max_evaluations=None,
+                 cancel_event=None):
+        self.stagnation = stagnation
+        self.time_budget = time_budget
+        self.target_fitness = target_fitness
+        self.max_evaluations = max_evaluations
+        self.cancel_event = cancel_event
+        self.start_time = None
+        self.best = None
+        self.since_improvement = 0
+        self.evaluations = 0
+
+    def start(self, logbook=None):
+        """reset the counters, picking up the progress recorded in the logbook of a resumed run"""
+        self.start_time = time.perf_counter()
+        self.best, self.since_improvement, self.evaluations = None, 0, 0
+        for record in logbook or []:
+            self.evaluations += record["nevals"]
+            if "best" in record:
+                self.update_best(record["best"][0])
+
+    def update_best(self, best):
+        if self.best is None or best > self.best:
+            self.best, self.since_improvement = best, 0
+        else:
+            self.since_improvement += 1
+
+    def check(self, population, nevals):
+        """account for a finished generation, return the reason to stop or None"""
+        self.evaluations += nevals
+        best = max(ind.fitness.values[0] for ind in population)
+        self.update_best(best)
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return "cancelled"
+        if self.target_fitness is not None and best >= self.target_fitness:
+            return "target fitness reached"
+        if self.stagnation is not None and self.since_improvement >= self.stagnation:
+            return f"no improvement in {self.stagnation} generations"
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return "evaluation budget spent"
+        if self.time_budget is not None and time.perf_counter() - self.start_time >= self.time_budget:
+            return "time budget spent"
+        return None
+
+
+def evaluate_invalid(individuals, toolbox, cache=None):
+    """assign fitness to the individuals whose fitness is invalid, return how many were evaluated
+
+    If an "evaluate_batch" method is registered in the toolbox, all invalid individuals are scored by a single call
+    to it, otherwise they are mapped through "evaluate" one at a time. With a FitnessCache, individuals whose
+    timetable is cached (or repeated within the generation) are not evaluated again, nor counted.
+    """
+    invalid_ind = [ind for ind in individuals if not ind.fitness.valid]
+    to_evaluate = invalid_ind
+    if cache is not None:
+        keys = [cache.key(ind) for ind in invalid_ind]
+        pending = {}  # key -> first individual to evaluate for it
+        for ind, key in zip(invalid_ind, keys):
+            fit = cache.get(key)
+            if fit is not None:
+                ind.fitness.values = fit
+            else:
+                pending.setdefault(key, ind)
+        to_evaluate = list(pending.values())
+    if hasattr(toolbox, "evaluate_batch"):
+        fitnesses = toolbox.evaluate_batch(to_evaluate) if to_evaluate else []
+    else:
+        fitnesses = toolbox.map(toolbox.evaluate, to_evaluate)
+    for ind, fit in zip(to_evaluate, fitnesses):
+        ind.fitness.values = fit
+    if cache is not None:
+        for key, ind in pending.items():
+            cache.put(key, ind.fitness.values)
+        for ind, key in zip(invalid_ind, keys):
+            if not ind.fitness.valid:
+                ind.fitness.values = pending[key].fitness.values
+    return len(to_evaluate)
+
+
+def ea_simple(population, toolbox, cxpb, mutpb, ngen, stats=None, halloffame=None, verbose=True,
+              logbook=None, start_gen=0, checkpoint_path=None, checkpoint_every=10, checkpoint_extra=None,
+              stop=None, improve_every=None, cache=None, profiler=None, progress=None):
+    """DEAP's eaSimple with the evaluation step factored into evaluate_invalid
+
+    Consumes the random number stream exactly like algorithms.eaSimple, so seeded runs give identical results.
+    To continue an earlier run, pass its logbook and the last generation it completed as start_gen, generations
+    start_gen + 1 to ngen are then appended to it.
+    If checkpoint_path is given, the run is saved there every checkpoint_every generations and after the last one,
+    together with the items of checkpoint_extra.
+    If improve_every is given and an "improve" method is registered in the toolbox, it is applied to the population
+    every improve_every generations (a memetic step, e.g. LocalSearch.improve_best) and returns its evaluation count.
+    stop is an optional StoppingCriteria. The reason the run ended is recorded under "stop" in the last logbook
+    record.
+    cache is an optional FitnessCache, its hit rate is recorded per generation under "hit_rate" (nevals only counts
+    the individuals actually evaluated).
+    profiler is an optional Profiler, whose per-generation figures are recorded as extra logbook columns.
+    progress is an optional callback, called with the logbook record and the hall of fame after every generation.
+    """
+    if logbook:
+        logbook[-1].pop("stop", None)
+    if stop is not None:
+        stop.start(logbook)
+    reason = None
+    if logbook is None:
+        logbook = tools.Logbook()
+        logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+        if cache is not None:
+            logbook.header.append('hit_rate')
+        if profiler is not None:
+            logbook.header.extend(profiler.GENERATION_FIELDS)
+            profiler.start_generation()
+
+        nevals = evaluate_invalid(population, toolbox, cache)
+        if halloffame is not None:
+            halloffame.update(population)
+        record = stats.compile(population) if stats else {}
+        if cache is not None:
+            record["hit_rate"] = cache.take_hit_rate()
+        if profiler is not None:
+            record.update(profiler.end_generation(nevals))
+        logbook.record(gen=start_gen, nevals=nevals, **record)
+        if verbose:
+            print(logbook.stream)
+        if progress is not None:
+            progress(logbook[-1], halloffame)
+        if stop is not None:
+            reason = stop.check(population, nevals)
+
+    for gen in range(start_gen + 1, ngen + 1):
+        if reason is not None:
+            break
+        if profiler is not None:
+            profiler.start_generation()
+        offspring = toolbox.select(population, len(population))
+        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+
+        nevals = evaluate_invalid(offspring, toolbox, cache)
+        if improve_every and gen % improve_every == 0 and hasattr(toolbox, "improve"):
+            nevals += toolbox.improve(offspring)
+        if halloffame is not None:
+            halloffame.update(offspring)
+        population[:] = offspring
+
+        record = stats.compile(population) if stats else {}
+        if cache is not None:
+            record["hit_rate"] = cache.take_hit_rate()
+        if profiler is not None:
+            record.update(profiler.end_generation(nevals))
+        logbook.record(gen=gen, nevals=nevals, **record)
+        if verbose:
+            print(logbook.stream)
+        if progress is not None:
+            progress(logbook[-1], halloffame)
+        if stop is not None:
+            reason = stop.check(population, nevals)
+
+        if checkpoint_path is not None and (gen % checkpoint_every == 0 or gen == ngen or reason is not None):
+            save_checkpoint(checkpoint_path, population, gen, halloffame, logbook, **(checkpoint_extra or {}))
+
+    if logbook:
+        logbook[-1]["stop"] = reason or "number of generations reached"
+        if verbose and reason is not None:
+            print(f"stopped after generation {logbook[-1]['gen']}: {reason}")
+    return population, logbook
+
+
+class ConstrainedFitness(base.Fitness):
+    """Multi-objective fitness whose first value counts constraint violations (Deb's constrained domination).
+
+    An individual with fewer violations dominates one with more, whatever its objectives, and between individuals
+    with as many violations the usual Pareto dominance on the remaining values applies. Weights must be negative.
+    """
+
+    def dominates(self, other, obj=slice(None)):
+        if self.wvalues[0] != other.wvalues[0]:
+            return self.wvalues[0] > other.wvalues[0]
+        return super().dominates(other, slice(1, None))
+
+
+def ea_nsga2(population, toolbox, mu, cxpb, mutpb, ngen, stats=None, halloffame=None, verbose=True, cache=None):
+    """NSGA-II, as in DEAP's NSGA-II example - binary tournaments on dominance and crowding distance pick the
+    parents, varAnd breeds them and toolbox.select (selNSGA2) keeps the best mu of parents and offspring.
+    mu must be a multiple of 4. The evaluation step is evaluate_invalid, so evaluate_batch and cache apply.
+    """
+    logbook = tools.Logbook()
+    logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
+
+    nevals = evaluate_invalid(population, toolbox, cache)
+    population = toolbox.select(population, mu)  # assigns the crowding distances
+    if halloffame is not None:
+        halloffame.update(population)
+    record = stats.compile(population) if stats else {}
+    logbook.record(gen=0, nevals=nevals, **record)
+    if verbose:
+        print(logbook.stream)
+
+    for gen in range(1, ngen + 1):
+        offspring = tools.selTournamentDCD(population, len(population))
+        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+        nevals = evaluate_invalid(offspring, toolbox, cache)
+        population = toolbox.select(population + offspring, mu)
+        if halloffame is not None:
+            halloffame.update(population)
+
+        record = stats.compile(population) if stats else {}
+        logbook.record(gen=gen, nevals=nevals, **record)
+        if verbose:
+            print(logbook.stream)
+    return population, logbook
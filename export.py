@@ -0,0 +1,94 @@
+import csv
+
+import numpy as np
+
+
+def fill_timetable(ts_table, exam2spats, day_col="day", slot_col="slot"):
+    """copy of the spatio-time table with every exam written into the cell of its day, slot and room
+
+    Cells are located through a (day, slot) -> row index built once, and all of them are filled in one assignment.
+    Like the row lookup it replaces, the first row of a day and slot is used and, when several exams share a
+    spatio-timeslot (bound exams), the cell holds the last one in exam2spats.
+    """
+    table = ts_table.fillna("").astype(str)
+    row_of = {}
+    for i, key in enumerate(zip(table[day_col].tolist(), table[slot_col].tolist())):
+        row_of.setdefault(key, i)
+    col_of = {column: j for j, column in enumerate(table.columns)}
+    cells = {}
+    for exam, spats in exam2spats.items():
+        cells[row_of[(str(spats[0]), str(spats[1]))], col_of[spats[2]]] = exam
+    values = table.to_numpy(dtype=object)
+    if cells:
+        rows, cols = np.array(list(cells), dtype=np.int64).T
+        values[rows, cols] = list(cells.values())
+    return type(table)(values, columns=table.columns)
+
+
+def json_default(value):
+    """default of json.dump for the values of the timetables and results - numpy scalars and arrays, and sets"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, set):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_frame(frame, path):
+    """write a DataFrame as CSV, or as Parquet if path ends with .parquet (needs pyarrow or fastparquet)"""
+    if str(path).endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+class RowWriter:
+    """Streaming table writer - rows are buffered and written chunksize at a time, as CSV or, if path ends with
+    .parquet, as row groups of a Parquet file (needs pyarrow). Use as a context manager."""
+
+    def __init__(self, path, columns, chunksize=10000):
+        self.path = str(path)
+        self.columns = list(columns)
+        self.chunksize = chunksize
+        self.rows = []
+        self.parquet = self.path.endswith(".parquet")
+        self.file = None
+        self.writer = None
+
+    def __enter__(self):
+        if self.parquet:
+            import pyarrow  # noqa: F401 - fail early if the optional dependency is missing
+        else:
+            self.file = open(self.path, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.columns)
+        return self
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunksize:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            batch = pa.Table.from_arrays([pa.array(column) for column in zip(*self.rows)], names=self.columns)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, batch.schema)
+            self.writer.write_table(batch)
+        else:
+            self.writer.writerows(self.rows)
+        self.rows = []
+
+    def __exit__(self, *exc):
+        self.flush()
+        if self.parquet:
+            if self.writer is not None:
+                self.writer.close()
+        else:
+            self.file.close()
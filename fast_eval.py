@@ -0,0 +1,378 @@
+import numpy as np
+
+from constants import INF, KPI_CONSEC_1, KPI_CONSEC_2, KPI_OVERLOAD_1, KPI_OVERLOAD_2, \
+    KPI_OVERLOAD_3, KPI_OVERLOAD_4, KPI_EXAM_DURA, KPI_SET
+
+# the KPIs that are sums of per-student contributions
+STUDENT_KPIS = (KPI_CONSEC_1, KPI_CONSEC_2, KPI_OVERLOAD_1, KPI_OVERLOAD_2, KPI_OVERLOAD_3, KPI_OVERLOAD_4)
+# exam days of a student that fit in one uint64 bitmask
+MAX_MASK_DAYS = 64
+BYTE_POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+
+def popcount(masks):
+    """number of set bits of every element of a uint64 array"""
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(masks)
+    masks = np.ascontiguousarray(masks)
+    return BYTE_POPCOUNT[masks.view(np.uint8)].reshape(masks.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def csr_rows(ptr, items, rows):
+    """the items of the given rows of a CSR list with row pointers ptr, concatenated"""
+    lengths = ptr[rows + 1] - ptr[rows]
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return items[np.repeat(ptr[rows], lengths) + offsets]
+
+
+def registration_columns(student_ptr, reg_exam):
+    """the registrations of a CSR incidence list as columns - for c = 0, 1, ..., the students with more than c exams
+    (None if all of them) and their c-th exam"""
+    num_regs = np.diff(student_ptr)
+    columns = []
+    for c in range(num_regs.max(initial=0)):
+        students = np.flatnonzero(num_regs > c)
+        exams = reg_exam[student_ptr[students] + c]
+        columns.append((None if len(students) == len(num_regs) else students, exams))
+    return columns
+
+
+class FastEvaluator:
+    """Array-based equivalent of GAOptimizer.evaluate.
+
+    The registration is compiled once into a sparse (student, exam) incidence list and the spatio-timeslots into
+    day/time/capacity index arrays, so scoring an individual is a handful of numpy operations instead of a Python
+    loop over every student. Fixed exams are appended to the timeslot arrays as extra "virtual" slots.
+    """
+
+    def __init__(self, available_spatio_timeslots, fixed_exams: dict, bindings: dict, student2exams: dict,
+                 exam2students: dict, week2date_dict: dict, kpi_coef: dict, room_caps: dict, conflict_graph,
+                 gene_exams=None, max_batch_size=256):
+        self.kpi_coef = kpi_coef
+        # individuals scored in one pass, bounds the (individual, registration) arrays of a batch
+        self.max_batch_size = max_batch_size
+
+        # exams - every exam that can appear in the full timetable
+        exams = list(exam2students)
+        exams += [exam for exam in list(fixed_exams) + list(bindings) if exam not in exam2students]
+        self.exams = exams
+        self.exam_idx = {exam: i for i, exam in enumerate(exams)}
+        self.exam_size = np.array([len(exam2students.get(exam, ())) for exam in exams], dtype=np.int64)
+        self.is_fixed = np.array([exam in fixed_exams for exam in exams], dtype=bool)
+
+        # spatio-timeslots - the available ones followed by one virtual slot per fixed exam
+        spatss = list(available_spatio_timeslots) + list(fixed_exams.values())
+        self.num_slots = len(available_spatio_timeslots)
+        days = np.array([spats[0] for spats in spatss])
+        self.days, self.slot_day = np.unique(days, return_inverse=True)
+        time_idx = {}
+        self.slot_time = np.array([time_idx.setdefault((spats[0], spats[1]), len(time_idx)) for spats in spatss],
+                                  dtype=np.int64)
+        self.slot_cap = np.array([room_caps.get(spats[2], np.inf) for spats in spatss], dtype=float)
+        self.fixed_exam_ids = np.array([self.exam_idx[exam] for exam in fixed_exams], dtype=np.int64)
+        self.fixed_slot_ids = np.arange(self.num_slots, len(spatss), dtype=np.int64)
+        self.bound_keys = np.array([self.exam_idx[exam] for exam in bindings], dtype=np.int64)
+        self.bound_values = np.array([self.exam_idx[exam] for exam in bindings.values()], dtype=np.int64)
+
+        # whether each day directly follows another exam day (consecutive-exam runs), and the days of each week
+        day_pos = {day.item(): i for i, day in enumerate(self.days)}
+        self.follows_day = np.array([day.item() - 1 in day_pos for day in self.days], dtype=bool)
+        self.week_mat = np.zeros((len(self.days), len(week2date_dict)), dtype=bool)
+        for w, week in enumerate(week2date_dict):
+            for day in set(week2date_dict[week]):
+                if day in day_pos:
+                    self.week_mat[day_pos[day], w] = True
+        # the same as bitmasks of day indices, see day_mask_kpis
+        if len(self.days) <= MAX_MASK_DAYS:
+            day_bits = np.left_shift(np.uint64(1), np.arange(len(self.days), dtype=np.uint64))
+            self.follows_mask = np.bitwise_or.reduce(day_bits[self.follows_day])
+            self.week_masks = [np.bitwise_or.reduce(day_bits[in_week]) for in_week in self.week_mat.T]
+
+        # sparse incidence matrix of the registration, stored as (student, exam) coordinates
+        reg_student, reg_exam = [], []
+        for s, registered_exams in enumerate(student2exams.values()):
+            reg_student += [s] * len(registered_exams)
+            reg_exam += [self.exam_idx[exam] for exam in registered_exams]
+        self.num_students = len(student2exams)
+        self.reg_student = np.array(reg_student, dtype=np.int64)
+        self.reg_exam = np.array(reg_exam, dtype=np.int64)
+        # row pointers of the incidence matrix by student and by exam (CSR/CSC)
+        self.student_ptr = np.concatenate(([0], np.cumsum([len(exams) for exams in student2exams.values()])))
+        self.exam_ptr = np.concatenate(([0], np.cumsum(np.bincount(self.reg_exam, minlength=len(exams)))))
+        self.exam_students = self.reg_student[np.argsort(self.reg_exam, kind="stable")]
+        self.reg_columns = registration_columns(self.student_ptr, self.reg_exam)
+
+        # integer-encoded chromosomes: exam index of every gene id, placeholders map to a dummy exam
+        self.gene_exam = None
+        if gene_exams is not None:
+            self.gene_exam = np.full(self.num_slots, len(exams), dtype=np.int64)
+            self.gene_exam[:len(gene_exams)] = [self.exam_idx[exam] for exam in gene_exams]
+
+        # conflicting exam pairs, none without a conflict graph (then only the KPIs are meaningful)
+        self.conflict_1 = self.conflict_2 = np.zeros(0, dtype=np.int64)
+        if conflict_graph is not None:
+            graph2exam = np.array([self.exam_idx[exam] for exam in conflict_graph.exams], dtype=np.int64)
+            self.conflict_1 = graph2exam[conflict_graph.edge_1]
+            self.conflict_2 = graph2exam[conflict_graph.edge_2]
+
+    def resolve_slots(self, individuals):
+        """slot id of every exam for a batch of individuals, following the arranged -> fixed -> bound order of
+        gen_full_table (-1: unplaced)"""
+        num_exams = len(self.exams)
+        # placeholders are written into a dummy exam column that is dropped afterwards
+        if self.gene_exam is not None:
+            genes = self.gene_exam[np.stack([np.asarray(individual)[:self.num_slots] for individual in individuals])]
+        else:
+            genes = np.array([[self.exam_idx.get(exam, num_exams) for exam in individual[:self.num_slots]]
+                              for individual in individuals], dtype=np.int64).reshape(len(individuals), -1)
+        slot_of = np.full((len(individuals), num_exams + 1), -1, dtype=np.int64)
+        rows = np.arange(len(individuals))[:, None]
+        slot_of[rows, genes] = np.arange(genes.shape[1])
+        slot_of = slot_of[:, :num_exams]
+        slot_of[:, self.fixed_exam_ids] = self.fixed_slot_ids
+        slot_of[:, self.bound_keys] = slot_of[:, self.bound_values]
+        return slot_of
+
+    def student_kpis(self, slot_of, students=None):
+        """per-student contributions to the STUDENT_KPIS of a batch of resolved timetables
+
+        Returns an (individual, student, kpi) array. If students is given, only those students are scored.
+        """
+        if students is None:
+            student_ptr, reg_exam = self.student_ptr, self.reg_exam
+        else:
+            student_ptr = np.concatenate(([0], np.cumsum(self.student_ptr[students + 1] - self.student_ptr[students])))
+            reg_exam = csr_rows(self.student_ptr, self.reg_exam, students)
+        day_of = self.slot_day[slot_of]
+        if len(self.days) <= MAX_MASK_DAYS:
+            return self.day_mask_kpis(day_of, student_ptr, reg_exam, self.reg_columns if students is None else None)
+        return self.sorted_day_kpis(day_of, student_ptr, reg_exam)
+
+    def day_mask_kpis(self, day_of, student_ptr, reg_exam, columns=None):
+        """student_kpis from a bitmask of the exam days of each student and individual - bit i is set if the student
+        has an exam on day self.days[i]
+
+        The masks are built from the registration columns if given (see registration_columns, faster for the whole
+        cohort), otherwise by reducing the registrations of each student.
+        """
+        num_ind, num_students = len(day_of), len(student_ptr) - 1
+        num_regs = np.diff(student_ptr)
+        exam_bits = np.left_shift(np.uint64(1), day_of.astype(np.uint64))
+        masks = np.zeros((num_ind, num_students), dtype=np.uint64)
+        if columns is not None:
+            for students, exams in columns:
+                if students is None:
+                    masks |= exam_bits[:, exams]
+                else:
+                    masks[:, students] |= exam_bits[:, exams]
+        else:
+            # reduceat needs non-empty groups, students without registrations keep an empty mask
+            registered = np.flatnonzero(num_regs)
+            if len(registered):
+                masks[:, registered] = np.bitwise_or.reduceat(exam_bits[:, reg_exam], student_ptr[registered], axis=1)
+
+        # runs of consecutive exam days, found from the last day of each run - which closes a run of 2 or 3 days if
+        # the student has a later exam day
+        one = np.uint64(1)
+        linked = masks << one
+        linked &= masks
+        linked &= self.follows_mask  # exam days continuing a run
+        later = masks >> one  # exam days before the student's last one
+        shift = 1
+        while shift < len(self.days):
+            later |= later >> np.uint64(shift)
+            shift *= 2
+        closing = linked >> one
+        np.invert(closing, out=closing)
+        closing &= linked
+        closing &= later
+        before = linked << one  # the day before also continues the run
+        pairs = closing & ~before
+        closing &= before
+        closing &= ~(linked << np.uint64(2))
+
+        # stored kpi-major, so that the sums over the students of calculate_kpis run over contiguous memory
+        kpi_values = np.zeros((num_ind, len(STUDENT_KPIS), num_students), dtype=np.int32)
+        kpi_values[:, 0] = popcount(pairs)
+        kpi_values[:, 1] = popcount(closing)
+        kpi_values[:, 2] = num_regs - popcount(masks)
+        for week_mask in self.week_masks:
+            week_counts = popcount(masks & week_mask)
+            kpi_values[:, 3] += week_counts > 3
+            kpi_values[:, 4] += week_counts == 4
+            kpi_values[:, 5] += week_counts == 5
+        return kpi_values.transpose(0, 2, 1)
+
+    def sorted_day_kpis(self, day_of, student_ptr, reg_exam):
+        """student_kpis from the sorted (individual, student, day) keys of the registrations, for any number of days"""
+        num_students = len(student_ptr) - 1
+        reg_student = np.repeat(np.arange(num_students), np.diff(student_ptr))
+        # (individual, student, day) key of every registration, sorted - the registrations are grouped by student,
+        # so sorting only orders the days of each student
+        num_ind, num_days = len(day_of), len(self.days)
+        size = num_ind * num_students
+        key_type = np.int32 if size * num_days < 2 ** 31 else np.int64
+        student_key = np.arange(num_ind, dtype=key_type)[:, None] * num_students + reg_student.astype(key_type)
+        keys = student_key * num_days + day_of[:, reg_exam].astype(key_type)
+        keys.sort(axis=1)
+        keys = keys.ravel()
+        # the exam days of each student, and whether the student's previous exam day is the day before
+        new = np.ones(len(keys), dtype=bool)
+        np.not_equal(keys[1:], keys[:-1], out=new[1:])
+        linked = np.zeros(len(keys), dtype=bool)
+        np.equal(keys[1:] - 1, keys[:-1], out=linked[1:])
+        keys, linked = keys[new], linked[new]
+        student, day = np.divmod(keys, num_days)
+        linked &= self.follows_day[day]
+
+        # runs of consecutive exam days, a run is only counted once a later exam day of the student breaks it
+        starts = np.flatnonzero(~linked)
+        run_length = np.diff(starts, append=len(keys))
+        run_student = student[starts]
+        closed = np.zeros(len(starts), dtype=bool)
+        np.equal(run_student[1:], run_student[:-1], out=closed[:-1])
+
+        kpi_values = np.zeros((size, len(STUDENT_KPIS)), dtype=np.int32)
+        kpi_values[:, 0] = np.bincount(run_student[closed & (run_length == 2)], minlength=size)
+        kpi_values[:, 1] = np.bincount(run_student[closed & (run_length == 3)], minlength=size)
+        kpi_values[:, 2] = np.tile(np.diff(student_ptr), num_ind) - np.bincount(student, minlength=size)
+        for in_week in self.week_mat.T:
+            week_counts = np.bincount(student[in_week[day]], minlength=size)
+            kpi_values[:, 3] += week_counts > 3
+            kpi_values[:, 4] += week_counts == 4
+            kpi_values[:, 5] += week_counts == 5
+        return kpi_values.reshape(num_ind, num_students, len(STUDENT_KPIS))
+
+    def exam_duration(self, slot_of):
+        """day of the last exam of each individual (at least 0)"""
+        placed = slot_of >= 0
+        return np.where(placed, self.days[self.slot_day[slot_of]], 0).max(axis=-1, initial=0)
+
+    def calculate_kpis(self, slot_of, totals=None):
+        """KPI values of a batch of resolved timetables, one row per individual and one column per KPI in KPI_SET
+
+        totals are the sums of the student_kpis of each individual, computed if not given.
+        """
+        if totals is None:
+            totals = self.student_kpis(slot_of).sum(axis=1)
+        kpi_values = np.zeros((len(slot_of), len(KPI_SET)), dtype=np.result_type(self.days, np.int64))
+        for k, kpi in enumerate(STUDENT_KPIS):
+            kpi_values[:, KPI_SET.index(kpi)] = totals[:, k]
+        kpi_values[:, KPI_SET.index(KPI_EXAM_DURA)] = self.exam_duration(slot_of)
+        return kpi_values
+
+    def count_violations(self, slot_of):
+        """number of capacity and conflicting-exam violations of each individual, each penalized by INF"""
+        placed = (slot_of >= 0) & ~self.is_fixed
+        cap_violations = placed & (self.exam_size > self.slot_cap[slot_of])
+        time_of = self.slot_time[slot_of]
+        clashes = time_of[:, self.conflict_1] == time_of[:, self.conflict_2]
+        return np.count_nonzero(cap_violations, axis=1) + np.count_nonzero(clashes, axis=1)
+
+    def kpis(self, individual):
+        kpi_values = self.calculate_kpis(self.resolve_slots([individual]))[0]
+        return {kpi: value.item() for kpi, value in zip(KPI_SET, kpi_values)}
+
+    def evaluate(self, individual):
+        return self.evaluate_batch([individual])[0]
+
+    def score_chunks(self, individuals):
+        """KPI values and violation counts of a list of individuals, max_batch_size individuals at a time"""
+        for start in range(0, len(individuals), self.max_batch_size):
+            slot_of = self.resolve_slots(individuals[start:start + self.max_batch_size])
+            yield self.calculate_kpis(slot_of), self.count_violations(slot_of)
+
+    def evaluate_batch(self, individuals):
+        """score a whole list of individuals at once"""
+        fitnesses = []
+        for kpi_values, violations in self.score_chunks(individuals):
+            fitnesses += [self.weigh(values, num_violations)
+                          for values, num_violations in zip(kpi_values.tolist(), violations.tolist())]
+        return fitnesses
+
+    def objectives(self, individual, objectives=KPI_SET):
+        return self.objectives_batch([individual], objectives)[0]
+
+    def objectives_batch(self, individuals, objectives=KPI_SET):
+        """multi-objective fitness of a list of individuals - the number of violations followed by the values of the
+        given KPIs"""
+        columns = [KPI_SET.index(kpi) for kpi in objectives]
+        fitnesses = []
+        for kpi_values, violations in self.score_chunks(individuals):
+            fitnesses += [(num_violations, *values) for values, num_violations
+                          in zip(kpi_values[:, columns].tolist(), violations.tolist())]
+        return fitnesses
+
+    def weigh(self, kpi_values, num_violations):
+        """weighted fitness of one row of KPI values, penalized by INF per violation"""
+        fitness = sum(self.kpi_coef[kpi] * value for kpi, value in zip(KPI_SET, kpi_values))
+        fitness -= INF * num_violations
+        return fitness,
+
+
+class DeltaEvaluator(FastEvaluator):
+    """FastEvaluator that rescores only what a change affects.
+
+    The per-student KPI contributions, their totals and the number of violations are cached on each individual (as
+    "eval_state"), and since DEAP clones offspring from their parents the cache travels with them. When an offspring
+    is evaluated, only the students registered in exams whose day changed are recomputed - this includes exams bound
+    to a moved exam, as bindings are resolved before comparing - and only the violations of the moved exams.
+
+    This pays off for small moves: a swap of two genes (local search, memetic steps, the TrajectorySolvers) affects
+    a few percent of the students and is rescored 1.1 to 4 times faster than in full, the larger the cohort the
+    better. An offspring of mutShuffleIndexes(indpb=0.1) moves about a fifth of the genes and affects 40 to 65% of
+    the students, rescoring them costs more than a full FastEvaluator pass (the break-even is at 15 to 30%), so above
+    max_delta_fraction of the students the individual is scored in full.
+    """
+
+    def __init__(self, *args, max_delta_fraction=0.2, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_delta_fraction = max_delta_fraction
+        # conflict edges of each exam (CSR), the clashes a move can change
+        edge_exam = np.concatenate((self.conflict_1, self.conflict_2))
+        self.edge_ptr = np.concatenate(([0], np.cumsum(np.bincount(edge_exam, minlength=len(self.exams)))))
+        self.exam_edges = np.tile(np.arange(len(self.conflict_1)), 2)[np.argsort(edge_exam, kind="stable")]
+
+    def affected_students(self, slot_of, prev_slot_of):
+        moved = np.flatnonzero(slot_of != prev_slot_of)
+        moved = moved[self.slot_day[slot_of[moved]] != self.slot_day[prev_slot_of[moved]]]
+        affected = np.zeros(self.num_students, dtype=bool)
+        affected[csr_rows(self.exam_ptr, self.exam_students, moved)] = True
+        return np.flatnonzero(affected)
+
+    def exam_violations(self, slot_of, exams, edges):
+        """capacity violations of the given exams and clashes of the given conflict edges in one resolved timetable"""
+        exam_slots = slot_of[exams]
+        placed = (exam_slots >= 0) & ~self.is_fixed[exams]
+        cap_violations = np.count_nonzero(placed & (self.exam_size[exams] > self.slot_cap[exam_slots]))
+        time_1 = self.slot_time[slot_of[self.conflict_1[edges]]]
+        time_2 = self.slot_time[slot_of[self.conflict_2[edges]]]
+        return cap_violations + np.count_nonzero(time_1 == time_2)
+
+    def evaluate(self, individual):
+        slot_of = self.resolve_slots([individual])
+        state = getattr(individual, "eval_state", None)
+        students = None
+        if state is not None:
+            prev_slot_of, student_kpis, totals, violations = state
+            students = self.affected_students(slot_of[0], prev_slot_of)
+        if students is None or len(students) > self.max_delta_fraction * self.num_students:
+            student_kpis = self.student_kpis(slot_of)[0]
+            totals = student_kpis.sum(axis=0)
+            violations = self.count_violations(slot_of)[0].item()
+        else:
+            if len(students):
+                new_kpis = self.student_kpis(slot_of, students)[0]
+                totals = totals - student_kpis[students].sum(axis=0) + new_kpis.sum(axis=0)
+                student_kpis = student_kpis.copy()
+                student_kpis[students] = new_kpis
+            moved = np.flatnonzero(slot_of[0] != prev_slot_of)
+            edges = np.zeros(len(self.conflict_1), dtype=bool)
+            edges[csr_rows(self.edge_ptr, self.exam_edges, moved)] = True
+            edges = np.flatnonzero(edges)
+            violations += (self.exam_violations(slot_of[0], moved, edges)
+                           - self.exam_violations(prev_slot_of, moved, edges))
+        individual.eval_state = (slot_of[0], student_kpis, totals, violations)
+
+        kpi_values = self.calculate_kpis(slot_of, totals[None])[0]
+        return self.weigh(kpi_values.tolist(), violations)
@@ -0,0 +1,54 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+def gene_key(individual, num_exams):
+    """canonical key of an integer chromosome - the genes from num_exams on are placeholders and all alike, and
+    bound exams follow their leader's gene, so two chromosomes with the same key give the same timetable"""
+    genes = np.asarray(individual, dtype=np.int64)
+    return np.where(genes < num_exams, genes, -1).astype(np.int32).tobytes()
+
+
+def exam_key(individual):
+    """canonical key of a chromosome of exam codes, where all placeholders are already alike"""
+    return tuple(individual)
+
+
+class FitnessCache:
+    """Bounded LRU cache of fitness values, keyed on the canonical form of a chromosome.
+
+    Selection keeps producing copies of the best chromosomes and mutations that only swap placeholders, whose
+    fitness DEAP invalidates although the timetable did not change. evaluate_invalid looks such individuals up here
+    instead of evaluating them again. Hits and lookups are counted per generation (see take_hit_rate).
+    """
+
+    def __init__(self, key=exam_key, maxsize=10000):
+        self.key = key
+        self.maxsize = maxsize
+        self.table = OrderedDict()
+        self.hits = 0
+        self.lookups = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def get(self, key):
+        self.lookups += 1
+        fitness = self.table.get(key)
+        if fitness is not None:
+            self.hits += 1
+            self.table.move_to_end(key)
+        return fitness
+
+    def put(self, key, fitness):
+        self.table[key] = fitness
+        self.table.move_to_end(key)
+        if len(self.table) > self.maxsize:
+            self.table.popitem(last=False)
+
+    def take_hit_rate(self):
+        """share of the lookups since the last call that were hits, and reset the counts"""
+        rate = self.hits / self.lookups if self.lookups else 0.0
+        self.hits = self.lookups = 0
+        return rate
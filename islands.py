@@ -0,0 +1,75 @@
+import copy
+import random
+from functools import partial
+
+from deap import tools
+
+from evolution import ea_simple
+from fitness_cache import FitnessCache, gene_key
+from options import EvaluationOptions, SearchOptions
+from parallel import worker_pool, worker_state
+
+
+def _setup_island(optimizer, kpi_coef, evaluation, search):
+    """the toolbox of the GA and fitness cache of a worker process"""
+    cache = None
+    if evaluation.cache_size:
+        cache = FitnessCache(partial(gene_key, num_exams=len(optimizer.gene_exams)), evaluation.cache_size)
+    toolbox = optimizer.build_toolbox(kpi_coef, evaluation.engine, evaluation.batch, search.constructive_init,
+                                      search.repair)
+    return {"toolbox": toolbox, "cache": cache}
+
+
+def _evolve_island(island, pop_size, crossover_rate, num_generation):
+    """run one island up to generation num_generation, starting from its saved population and random state"""
+    random.setstate(island["rndstate"])
+    toolbox = worker_state["toolbox"]
+    if island["population"] is None:
+        island["population"] = toolbox.population(n=pop_size)
+    hof = tools.HallOfFame(1)
+    # keeps the best individual of the previous rounds, a new population has no fitness yet
+    if all(ind.fitness.valid for ind in island["population"]):
+        hof.update(island["population"])
+    stats = tools.Statistics(key=lambda ind: ind.fitness.values)
+    stats.register("best", max)
+    pop, log = ea_simple(island["population"], toolbox, cxpb=crossover_rate, mutpb=island["mutation_rate"],
+                         ngen=num_generation, stats=stats, halloffame=hof, verbose=False,
+                         logbook=island["logbook"], start_gen=island["generation"], cache=worker_state["cache"])
+    island.update(population=pop, logbook=log, generation=num_generation, rndstate=random.getstate(), best=hof[0])
+    return island
+
+
+def run_islands(optimizer, kpi_coef, n_islands=4, pop_size=100, crossover_rate=0, mutation_rate=0.5,
+                num_generation=200, migration_interval=20, migration_size=5, topology="ring", seed=None, n_workers=None,
+                evaluation=None, search=None):
+    """island-model GA, see GAOptimizer.optimize_islands; returns (hall of fame, populations, logbooks)"""
+    evaluation = evaluation or EvaluationOptions()
+    search = search or SearchOptions()
+    if topology == "ring":
+        migarray = list(range(1, n_islands)) + [0]
+    elif len(topology) == n_islands:
+        migarray = list(topology)
+    else:
+        raise ValueError(f"unknown migration topology: {topology}")
+    mutation_rates = mutation_rate if isinstance(mutation_rate, (list, tuple)) else [mutation_rate] * n_islands
+    # fixes the gene numbering before the optimizer is sent to the workers
+    optimizer.build_toolbox(kpi_coef, evaluation.engine, evaluation.batch)
+
+    base_seed = random.randrange(2 ** 32) if seed is None else seed
+    islands = [{"population": None, "logbook": None, "generation": 0, "mutation_rate": mutation_rates[i],
+                "rndstate": random.Random(base_seed + i).getstate()} for i in range(n_islands)]
+    hof = tools.HallOfFame(1)
+    with worker_pool(min(n_islands, n_workers or n_islands), _setup_island, optimizer=optimizer, kpi_coef=kpi_coef,
+                     evaluation=evaluation, search=search) as executor:
+        generation = 0
+        while generation < num_generation:
+            generation = min(generation + migration_interval, num_generation)
+            islands = list(executor.map(_evolve_island, islands, [pop_size] * n_islands,
+                                        [crossover_rate] * n_islands, [generation] * n_islands))
+            hof.update([island["best"] for island in islands])
+            if generation < num_generation:
+                # the best individuals of each island replace the worst ones of its neighbour
+                tools.migRing([island["population"] for island in islands], migration_size,
+                              lambda pop, k: [copy.deepcopy(ind) for ind in tools.selBest(pop, k)],
+                              replacement=tools.selWorst, migarray=migarray)
+    return hof, [island["population"] for island in islands], [island["logbook"] for island in islands]
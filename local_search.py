@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+from deap import tools
+
+from constraints import SlotConstraints
+
+
+class LocalSearch(SlotConstraints):
+    """Swap hill-climbing on integer-encoded chromosomes, scored with a (preferably delta) FastEvaluator.
+
+    Each move swaps two genes and is kept if the fitness does not get worse (sideways moves help to cross the
+    plateaus left by the INF penalties). Moves are picked in this order of priority:
+    - repair: move an exam that violates capacity or conflicts with another exam to a slot with enough capacity
+      and no conflicting exam at that day and slot
+    - compress: move an exam off the last exam day to a free slot on an earlier day, to shorten the exam period
+    - kick: swap two random genes
+    """
+
+    def __init__(self, evaluator, max_moves=50):
+        super().__init__(evaluator)
+        self.max_moves = max_moves
+        self.evaluate = evaluator.evaluate  # may be replaced, e.g. to add a move penalty
+
+    def propose(self, individual):
+        """positions of the two genes to swap"""
+        ev = self.evaluator
+        genes = np.asarray(individual)
+        gene_exam = ev.gene_exam[genes]  # len(ev.exams) for placeholders
+        slot_of = ev.resolve_slots([individual])[0]
+        leader = self.leader
+
+        violating = self.violating_exams(slot_of)
+        violating = violating[np.isin(leader[violating], gene_exam)]
+        if len(violating):
+            exam = leader[random.choice(violating.tolist())]
+            p = int(np.flatnonzero(gene_exam == exam)[0])
+            candidates = self.feasible_slots(exam, slot_of)
+            if len(candidates):
+                return p, int(random.choice(candidates.tolist()))
+
+        is_exam = gene_exam < len(ev.exams)
+        genes_day = ev.slot_day[:ev.num_slots]
+        last_day = genes_day[is_exam].max(initial=-1)
+        if last_day >= 0 and last_day >= ev.slot_day[slot_of[slot_of >= 0]].max():
+            late = np.flatnonzero(is_exam & (genes_day == last_day))
+            p = int(random.choice(late.tolist()))
+            candidates = self.feasible_slots(gene_exam[p], slot_of)
+            candidates = candidates[~is_exam[candidates] & (genes_day[candidates] < last_day)]
+            if len(candidates):
+                return p, int(random.choice(candidates.tolist()))
+
+        p, q = random.sample(range(len(individual)), 2)
+        return p, q
+
+    def improve(self, individual):
+        """hill-climb the individual in place, return the number of evaluations spent"""
+        if not individual.fitness.valid:
+            individual.fitness.values = self.evaluate(individual)
+        for _ in range(self.max_moves):
+            p, q = self.propose(individual)
+            state = getattr(individual, "eval_state", None)
+            individual[p], individual[q] = individual[q], individual[p]
+            fitness = self.evaluate(individual)
+            if fitness[0] >= individual.fitness.values[0]:
+                individual.fitness.values = fitness
+            else:
+                individual[p], individual[q] = individual[q], individual[p]
+                if state is not None:
+                    individual.eval_state = state
+        return self.max_moves
+
+    def improve_best(self, population, n_elite=5):
+        """memetic step - improve the n_elite best individuals of the population"""
+        return sum(self.improve(ind) for ind in tools.selBest(population, n_elite))
@@ -1,31 +1,39 @@
-import csv
 import random
-from itertools import combinations
+from functools import partial
 
-import matplotlib.pyplot as plt
-import pandas as pd
-from prettytable import PrettyTable
+import numpy as np
 
-from deap import algorithms
 from deap import base
 from deap import creator
 from deap import tools
 
+from conflict_graph import ConflictGraph
+from evolution import StoppingCriteria, ea_simple
+from export import RowWriter
+from fitness_cache import FitnessCache, exam_key
+from options import EvaluationOptions
+from parallel import EvaluationPool
+from registration import load_wide_registration, load_long_registration
+from solvers import make_solver, run_restarts
 
-def evaluate_timetable_for_students(arranged_exams: list, fixed_exams: dict, bindings: dict, students: dict,
-                                    available_dates: list, week_date_dict: dict):
+
+def gen_exam_date_table(arranged_exams: list, fixed_exams: dict, bindings: dict, available_dates: list):
     # combine three types of exams to get complete exam timetable
     exam_date_table = {exam: date for exam, date in zip(arranged_exams, available_dates) if exam != "no_exam_today"}
     for exam, date in fixed_exams.items():
         exam_date_table[exam] = date
     for exam_k, exam_v in bindings.items():
         exam_date_table[exam_k] = exam_date_table[exam_v]
+    return exam_date_table
 
-    # calculate indicators - 2/3/4/5 consecutive exams and 4 exams a week
-    consecutive_exams = {2: 0, 3: 0, 4: 0, 5: 0}
-    having_4_exams_a_week = 0
 
+def student_indicators(exam_date_table: dict, students: dict, week_date_dict: dict):
+    """per-student indicators of a complete timetable - (2, 3, 4, 5 consecutive exams, 4 exams a week) for each
+    student, in the order of students"""
+    week_dates = [set(dates) for dates in week_date_dict.values()]
     for _, registered_exams in students.items():
+        consecutive_exams = {2: 0, 3: 0, 4: 0, 5: 0}
+        having_4_exams_a_week = 0
         student_exam_dates = [exam_date_table[exam] for exam in registered_exams]
         student_exam_dates.sort()
         # check whether this student has 2/3/4/5 consecutive exams
@@ -41,11 +49,19 @@ def evaluate_timetable_for_students(arranged_exams: list, fixed_exams: dict, bin
             consecutive_exams[consecutive_count] += 1
         # check whether this student has 4 exams in a week
         student_exam_dates_set = set(student_exam_dates)
-        for week in week_date_dict:
-            if len(student_exam_dates_set.intersection(set(week_date_dict[week]))) == 4:
+        for dates in week_dates:
+            if len(student_exam_dates_set.intersection(dates)) == 4:
                 having_4_exams_a_week += 1
+        yield consecutive_exams[2], consecutive_exams[3], consecutive_exams[4], consecutive_exams[5], \
+            having_4_exams_a_week
 
-    return consecutive_exams[2], consecutive_exams[3], consecutive_exams[4], consecutive_exams[5], having_4_exams_a_week
+
+def evaluate_timetable_for_students(arranged_exams: list, fixed_exams: dict, bindings: dict, students: dict,
+                                    available_dates: list, week_date_dict: dict):
+    exam_date_table = gen_exam_date_table(arranged_exams, fixed_exams, bindings, available_dates)
+    # calculate indicators - 2/3/4/5 consecutive exams and 4 exams a week, summed over the students
+    totals = tuple(map(sum, zip(*student_indicators(exam_date_table, students, week_date_dict))))
+    return totals or (0, 0, 0, 0, 0)
 
 
 def ga_evaluate(individual, fixed_exams: dict, bindings: dict, students: dict,
@@ -64,7 +80,7 @@ class Optimizer:
         # processed data
         self.exams = None  # {exam_code: students}
         self.students = None # {student_id: selected_exams}
-        self.no_overlap_exams_pairs = None
+        self.conflict_graph = None
         # all exams are classified into three categories - bound, fixed and arranged
         self.bindings = dict()  # the "key" exam is bound with the "value" exam
         self.fixed_exams = dict()  # key is exam, value is date
@@ -72,79 +88,85 @@ class Optimizer:
         # ga_results
         self.ga_pop = None
         self.ga_log = None
+        self.stop_reason = None  # why the last GA run ended
         self.exam_date_table = None  # optimised and complete exam timetable
 
-    def initialize(self, available_dates, week_date_dict, fixed_exams, regis_datafile=None, id_column=None):
+    def initialize(self, available_dates, week_date_dict, fixed_exams, regis_datafile=None, id_column=None,
+                   exam_column=None):
         self.available_dates = available_dates
         self.week_date_dict = week_date_dict
         self.fixed_exams = fixed_exams
 
         if regis_datafile is not None:
-            self.process_register_data(regis_datafile, id_column)
+            self.process_register_data(regis_datafile, id_column, exam_column)
 
         if self.exams is not None:
             self.check_overlap()
             self.generate_bindings()
 
-    def process_register_data(self, regis_datafile, id_column="ID"):
-        student_regis_table = pd.read_csv(regis_datafile, index_col=id_column)
-
-        students = {}
-        for student_id, row in student_regis_table.iterrows():
-            selected_exams = []
-            for exam_code, selected in row.items():
-                if selected:
-                    selected_exams.append(exam_code)
-            students[student_id] = set(selected_exams)
-
-        exams = {}
-        for exam_code, col in student_regis_table.iteritems():
-            registered_students = []
-            for student_id, registered in col.items():
-                if registered:
-                    registered_students.append(student_id)
-
-            # only arrange the exams for which at least one student registered
-            if len(registered_students):
-                exams[exam_code] = set(registered_students)
+    def process_register_data(self, regis_datafile, id_column="ID", exam_column=None):
+        """read the registration data, either a student x exam 0/1 matrix with one row per student, or (if
+        exam_column is given) a long table with one (student, exam) registration per row"""
+        if exam_column is None:
+            students, exams = load_wide_registration(regis_datafile, id_column)
+        else:
+            students, exams = load_long_registration(regis_datafile, id_column, exam_column)
 
         self.students = students
         self.exams = exams
         return students, exams
 
     def check_overlap(self):
-        no_overlap_exams_pairs = []
-        for i, j in combinations(self.exams.keys(), 2):
-            if not set.intersection(self.exams[i], self.exams[j]):
-                no_overlap_exams_pairs.append([i, j])
-
-        self.no_overlap_exams_pairs = no_overlap_exams_pairs
-        return no_overlap_exams_pairs
+        self.conflict_graph = ConflictGraph(self.exams, self.students)
+        return self.conflict_graph
 
     def generate_bindings(self):
         """ Compress the exams - put 2 non-conflicting exams on the same day"""
         bindings = {}  # the "key" exam will follow the "value" exam
-        free_exams = set(self.exams.keys())  # exams have not been bound with others
-        for exam_1, exam_2 in self.no_overlap_exams_pairs:
-            if exam_1 in free_exams and exam_2 in free_exams:
-                if exam_1 in self.fixed_exams:  # the "key" exam cannot be a fixed exam
-                    bindings[exam_2] = exam_1
-                else:
-                    bindings[exam_1] = exam_2
-                free_exams.remove(exam_1)
-                free_exams.remove(exam_2)
+        graph = self.conflict_graph
+        free_exams = np.ones(len(graph), dtype=bool)  # exams have not been bound with others
+        # pair each exam with the first free, non-conflicting exam after it (itertools.combinations order)
+        for i, exam_1 in enumerate(graph.exams):
+            if not free_exams[i]:
+                continue
+            j = graph.first_compatible(i, free_exams)
+            if j is None:
+                continue
+            exam_2 = graph.exams[j]
+            if exam_1 in self.fixed_exams:  # the "key" exam cannot be a fixed exam
+                bindings[exam_2] = exam_1
+            else:
+                bindings[exam_1] = exam_2
+            free_exams[i] = free_exams[j] = False
 
         self.bindings = bindings
         return bindings
 
-    def optimize(self, kpi_weights, pop_size=100, crossover_rate=0, mutation_rate=0.5, num_generation=200):
-
+    def chromosome_genes(self):
+        """the free exams, padded with "no_exam_today" placeholders to one gene per available date"""
         free_exams = list(set(self.exams.keys()) - set(self.fixed_exams) - set(self.bindings.keys()))
         if len(free_exams) > len(self.available_dates):
             raise ValueError("the number of exams exceeds the number of available dates")
         else:
             num_no_exam = len(self.available_dates) - len(free_exams)
             free_exams += ["no_exam_today"] * num_no_exam
+        return free_exams
+
+    def optimize(self, kpi_weights, pop_size=100, crossover_rate=0, mutation_rate=0.5, num_generation=200,
+                 evaluation=None, stop=None):
+        """run the GA and return the optimised timetable
+
+        evaluation is an EvaluationOptions (see options) of the python engine: the evaluations run on its backend
+        and n_workers, and the fitness values of the last cache_size distinct timetables are memoized (see
+        FitnessCache), the hit rate of each generation is logged as hit_rate.
+
+        The run ends after num_generation generations, or earlier once one of the StoppingCriteria stop is met. The
+        reason is kept in stop_reason and in the last logbook record.
+        """
+        evaluation = evaluation or EvaluationOptions()
+        if evaluation.engine != "python" or evaluation.batch:
+            raise ValueError("Optimizer only has the python engine, see new.GAOptimizer for the numpy ones")
+        free_exams = self.chromosome_genes()
 
         # define chromosome and individual
         creator.create("Fitness", base.Fitness, weights=(1,))
@@ -155,10 +177,13 @@ class Optimizer:
                          toolbox.chromosome)
         toolbox.register("population", tools.initRepeat, list, toolbox.individual)
         # define evaluation, mutation, crossover and selection methods
-        toolbox.register("evaluate", ga_evaluate, fixed_exams=self.fixed_exams, bindings=self.bindings,
-                         students=self.students,
-                         available_dates=self.available_dates, week_date_dict=self.week_date_dict,
-                         kpi_weights=kpi_weights)
+        evaluate = partial(ga_evaluate, fixed_exams=self.fixed_exams, bindings=self.bindings,
+                           students=self.students,
+                           available_dates=self.available_dates, week_date_dict=self.week_date_dict,
+                           kpi_weights=kpi_weights)
+        pool = EvaluationPool(evaluation.backend, evaluation.n_workers, evaluate)
+        toolbox.register("evaluate", evaluate)
+        toolbox.register("map", pool.map)
         toolbox.register("mate", tools.cxPartialyMatched)
         toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.1)
         toolbox.register("select", tools.selTournament, tournsize=5)
@@ -167,53 +192,75 @@ class Optimizer:
         hof = tools.HallOfFame(1)
         stats = tools.Statistics(key=lambda ind: ind.fitness.values)
         stats.register("best", max)
-        pop, log = algorithms.eaSimple(pop, toolbox, cxpb=crossover_rate, mutpb=mutation_rate, ngen=num_generation,
-                                       stats=stats, halloffame=hof,
-                                       verbose=True)
+        cache = FitnessCache(exam_key, evaluation.cache_size) if evaluation.cache_size else None
+        with pool:
+            pop, log = ea_simple(pop, toolbox, cxpb=crossover_rate, mutpb=mutation_rate, ngen=num_generation,
+                                 stats=stats, halloffame=hof, verbose=True,
+                                 stop=stop or StoppingCriteria(),
+                                 cache=cache)
         self.ga_pop = pop
         self.ga_log = log
+        self.stop_reason = log[-1]["stop"]
         self.arranged_exams = hof[0]
 
         exam_date_table = self.gen_time_table()
         return exam_date_table
 
+    def solve(self, kpi_weights, solver="annealing", n_restarts=1, seed=None, n_workers=None, **solver_options):
+        """single-solution search instead of the GA - simulated annealing, tabu search or another TrajectorySolver
+        (see solvers) - on the GA's chromosome and fitness, from n_restarts independent random timetables on up to
+        n_workers processes, restart i seeded with seed + i
+
+        solver_options go to the solver, e.g. max_evaluations, time_budget or tenure. Returns the best timetable,
+        the logbook of every restart is kept in ga_log.
+        """
+        free_exams = self.chromosome_genes()
+        evaluate = partial(ga_evaluate, fixed_exams=self.fixed_exams, bindings=self.bindings,
+                           students=self.students,
+                           available_dates=self.available_dates, week_date_dict=self.week_date_dict,
+                           kpi_weights=kpi_weights)
+        initial = partial(random.sample, free_exams, len(free_exams))
+        results = run_restarts(make_solver(solver, **solver_options), initial, evaluate,
+                               n_restarts=n_restarts, seed=seed, n_workers=n_workers)
+        best, _, _, reason = max(results, key=lambda result: result[1][0])
+        self.ga_pop = [result[0] for result in results]
+        self.ga_log = [result[2] for result in results]
+        self.stop_reason = reason
+        self.arranged_exams = best
+
+        exam_date_table = self.gen_time_table()
+        return exam_date_table
+
     def gen_time_table(self):
-        # combine three types of exams to get complete exam timetable
-        exam_date_table = {exam: date for exam, date in zip(self.arranged_exams, self.available_dates) if
-                           exam != "no_exam_today"}
-        for exam, date in self.fixed_exams.items():
-            exam_date_table[exam] = date
-        for exam_k, exam_v in self.bindings.items():
-            exam_date_table[exam_k] = exam_date_table[exam_v]
+        exam_date_table = gen_exam_date_table(self.arranged_exams, self.fixed_exams, self.bindings,
+                                              self.available_dates)
         self.exam_date_table = exam_date_table
         return exam_date_table
 
-    def output_time_table(self, overall=True, student_specific=False):
-
+    def output_time_table(self, overall=True, student_specific=False, path="data/Exam_timetable.csv",
+                          student_path="data/Student-specific_exam_timetable.csv", chunksize=10000):
+        """write the exam timetable and/or the per-student timetables, streamed as CSV or (.parquet) Parquet"""
         if overall:
-            with open("data/Exam_timetable.csv", "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(["Course", "Exam Date"])
-                writer.writerows([[exam, date] for exam, date in self.exam_date_table.items()])
+            with RowWriter(path, ["Course", "Exam Date"], chunksize) as writer:
+                for exam, date in self.exam_date_table.items():
+                    writer.write([exam, date])
 
         if student_specific:
-            with open("data/Student-specific_exam_timetable.csv", "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(["Student ID", "Exams and Dates",
-                                 "Having 2 Consecutive Exams", "Having 3 Consecutive Exams",
-                                 "Having 4 Consecutive Exams", "Having 5 Consecutive Exams", "Having 4 Exams a week"])
-
-                for student, registered_exams in self.students.items():
-                    kpis = evaluate_timetable_for_students(self.arranged_exams, self.fixed_exams,
-                                                           self.bindings, {student: registered_exams},
-                                                           self.available_dates, self.week_date_dict)
+            columns = ["Student ID", "Exams and Dates",
+                       "Having 2 Consecutive Exams", "Having 3 Consecutive Exams",
+                       "Having 4 Consecutive Exams", "Having 5 Consecutive Exams", "Having 4 Exams a week"]
+            indicators = student_indicators(self.exam_date_table, self.students, self.week_date_dict)
+            with RowWriter(student_path, columns, chunksize) as writer:
+                for (student, registered_exams), kpis in zip(self.students.items(), indicators):
                     registered_exams_dates ={exam:self.exam_date_table[exam] for exam in registered_exams}
 
-                    writer.writerow([student, registered_exams_dates] + list(kpis))
+                    writer.write([student, str(registered_exams_dates)] + list(kpis))
 
     def print_result(self, exam_table=True, student_statistic=True, ga_convergence=False):
         import operator
 
+        from prettytable import PrettyTable
+
         if exam_table:
             table = PrettyTable()
             table.field_names = ["Course Code", "Exam Date"]
@@ -228,10 +275,8 @@ class Optimizer:
                                   "5 consecutive exams": 0}
             table.field_names = ["Student ID", "Having 2 Consecutive Exams", "Having 3 Consecutive Exams",
                                  "Having 4 Consecutive Exams", "Having 5 Consecutive Exams", "Having 4 Exams a week"]
-            for student, registered_exams in self.students.items():
-                kpis = evaluate_timetable_for_students(self.arranged_exams, self.fixed_exams,
-                                                       self.bindings, {student: registered_exams},
-                                                       self.available_dates, self.week_date_dict)
+            indicators = student_indicators(self.exam_date_table, self.students, self.week_date_dict)
+            for student, kpis in zip(self.students, indicators):
                 table.add_row([student] + list(kpis))
 
                 if kpis[2] > 0 or kpis[4] > 0:
@@ -249,6 +294,8 @@ class Optimizer:
             print("There are/is {0} student(s) having 5 exams a week".format(total_student_nums["5 consecutive exams"]))
 
         if ga_convergence:
+            import matplotlib.pyplot as plt
+
             fitness_records = [record[0] for record in self.ga_log.select("best")]
             plt.xlabel("Number of Generation")
             plt.ylabel("Best fitness")
@@ -1,26 +1,47 @@
+import array
 import csv
+import math
 import random
+from functools import partial
 from itertools import combinations
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
-from deap import algorithms
 from deap import base
 from deap import creator
 from deap import tools
 
-INF = 1e7
-NO_EXAM_PLACEHOLDER = "no exam"
-KPI_CONSEC_1 = "2 consecutive exams in a week"
-KPI_CONSEC_2 = "3 consecutive exams in a week"
-KPI_OVERLOAD_1 = "more than 1 exam in a day"
-KPI_OVERLOAD_2 = "more than 3 exams in a week"
-KPI_OVERLOAD_3 = "4 exams in a week"
-KPI_OVERLOAD_4 = "5 exams in a week"
-KPI_EXAM_DURA = "duration of the exam period"
-KPI_SET = (KPI_CONSEC_1, KPI_CONSEC_2, KPI_OVERLOAD_1, KPI_OVERLOAD_2, KPI_EXAM_DURA, KPI_OVERLOAD_3, KPI_OVERLOAD_4)
+from constants import INF, NO_EXAM_PLACEHOLDER, KPI_CONSEC_1, KPI_CONSEC_2, KPI_OVERLOAD_1, KPI_OVERLOAD_2, \
+    KPI_OVERLOAD_3, KPI_OVERLOAD_4, KPI_EXAM_DURA, KPI_SET
+from conflict_graph import ConflictGraph, dsatur_groups
+from constraints import SlotConstraints
+from evolution import ConstrainedFitness, StoppingCriteria, ea_nsga2, ea_simple, load_checkpoint
+from export import RowWriter, fill_timetable, write_frame
+from fast_eval import STUDENT_KPIS, FastEvaluator, DeltaEvaluator
+from fitness_cache import FitnessCache, gene_key
+from islands import run_islands
+from local_search import LocalSearch
+from parallel import EvaluationPool
+from preprocess_cache import PreprocessCache
+from options import Checkpointing, EvaluationOptions, SearchOptions
+from profiler import Profiler, null_stage
+from registration import load_wide_registration, load_long_registration
+from solvers import make_solver, run_restarts
+from warm_start import MovePenalty, encode_timetable, evaluate_batch_penalized, evaluate_penalized, read_timetable, \
+    warm_population
+
+
+def create_types():
+    """define the DEAP fitness and individual classes, also needed by worker processes to unpickle individuals"""
+    creator.create("Fitness", base.Fitness, weights=(1,))
+    creator.create("Individual", array.array, typecode="i", fitness=creator.Fitness)
+
+
+def create_pareto_types(num_objectives):
+    """DEAP types of the multi-objective mode - the number of violations then the objectives, all minimized"""
+    creator.create("ParetoFitness", ConstrainedFitness, weights=(-1.0,) * (num_objectives + 1))
+    creator.create("ParetoIndividual", array.array, typecode="i", fitness=creator.ParetoFitness)
 
 
 class GAOptimizer:
@@ -31,25 +52,53 @@ class GAOptimizer:
         # processed data
         self.exam2students = None  # {exam_code: set(students)}
         self.student2exams = None  # {student_id: set(selected_exams)}
-        self.no_conflict_exams_pairs = None  # [(exam1,exam2),...]
-        self.conflict_exams_pairs = None  # [(exam1,exam2),...]
+        self.conflict_graph = None  # ConflictGraph of exam2students
         # all exams are classified into three categories - bound, fixed and arranged
         self.bindings = dict()  # the "key" exam is bound with the "value" exam
+        self.compression_report = None  # search space reduction achieved by the bindings
+        self.preprocess_cache = None  # PreprocessCache of the inputs, if initialized with a cache_dir
+        self.cache_key = None
         self.fixed_exams = dict()  # key is exam, value is date
         self.arranged_exams = list()  # a sequence of exams (including placeholders) that have been arranged
+        self.gene_exams = None  # gene id -> exam code, gene ids beyond this list are placeholders
         # ga_results
         self.ga_pop = None
         self.ga_log = None
+        self.stop_reason = None  # why the last GA run ended
+        self.profiler = None  # Profiler of the last run, if it was profiled
+        self.moved_exams = None  # exams the last warm-started run moved off their previous slot, with move_penalty
+        self.pareto_front = None  # non-dominated individuals of the last multi-objective run
         self.exam2spats = None  # optimised and complete exam timetable
+        self.best_fitness = None  # fitness of exam2spats, as given to set_best
 
     def initialize(self, spatime_file, rooms, room_caps, fixed_exams, regis_datafile,
-                   id_col="ID", day_col="day", week_col="week", slot_col="slot"):
+                   id_col="ID", day_col="day", week_col="week", slot_col="slot", exam_col=None, cache_dir=None):
+        """read the inputs and build the conflict graph
+
+        With cache_dir, the preprocessed data (and the bindings generated later) are stored in a PreprocessCache there
+        and reused by the next runs on the same input files and options.
+        """
         self.fixed_exams = fixed_exams
         self.room_caps = room_caps
 
+        if cache_dir is not None:
+            self.preprocess_cache = PreprocessCache(cache_dir)
+            self.cache_key = self.preprocess_cache.key(spatime_file, regis_datafile, rooms=list(rooms), id_col=id_col,
+                                                       day_col=day_col, week_col=week_col, slot_col=slot_col,
+                                                       exam_col=exam_col)
+            cached = self.preprocess_cache.load(self.cache_key)
+            if cached is not None:
+                for name, value in cached.items():
+                    setattr(self, name, value)
+                # the spatio-time table itself is only used for output and is small
+                self.ts_table = pd.read_csv(spatime_file)
+                return
+
         self.process_spatio_time_data(spatime_file, rooms, day_col, week_col, slot_col)
-        self.process_register_data(regis_datafile, id_col)
+        self.process_register_data(regis_datafile, id_col, exam_col)
         self.check_conflict()
+        if self.preprocess_cache is not None:
+            self.preprocess_cache.save(self.cache_key, self)
 
     def process_spatio_time_data(self, spatime_file, rooms, day_col="day", week_col="week", slot_col="slot"):
         spatime_table = pd.read_csv(spatime_file)
@@ -71,103 +120,362 @@ class GAOptimizer:
         self.available_spatio_timeslots = available_spatio_timeslots
         self.ts_table = spatime_table
 
-    def process_register_data(self, regis_datafile, id_column="ID"):
-        student_regis_table = pd.read_csv(regis_datafile, index_col=id_column)
-
-        students = {}
-        for student_id, row in student_regis_table.iterrows():
-            selected_exams = []
-            for exam_code, selected in row.items():
-                if selected:
-                    selected_exams.append(exam_code)
-            students[student_id] = set(selected_exams)
-
-        exams = {}
-        for exam_code, col in student_regis_table.iteritems():
-            registered_students = []
-            for student_id, registered in col.items():
-                if registered:
-                    registered_students.append(student_id)
-
-            # only arrange the exams for which at least one student registered
-            if len(registered_students):
-                exams[exam_code] = set(registered_students)
+    def process_register_data(self, regis_datafile, id_column="ID", exam_column=None):
+        """read the registration data, either a student x exam 0/1 matrix with one row per student, or (if
+        exam_column is given) a long table with one (student, exam) registration per row"""
+        if exam_column is None:
+            students, exams = load_wide_registration(regis_datafile, id_column)
+        else:
+            students, exams = load_long_registration(regis_datafile, id_column, exam_column)
 
         self.student2exams = students
         self.exam2students = exams
         return students, exams
 
     def check_conflict(self):
-        no_overlap_exams_pairs = []
-        overlap_exams_pairs = []
-        for i, j in combinations(self.exam2students.keys(), 2):
-            if not set.intersection(self.exam2students[i], self.exam2students[j]):
-                no_overlap_exams_pairs.append((i, j))
-            else:
-                overlap_exams_pairs.append((i, j))
+        self.conflict_graph = ConflictGraph(self.exam2students, self.student2exams)
+        return self.conflict_graph
+
+    def generate_bindings(self, method="pairs"):
+        """ Compress the exams - put non-conflicting exams on the same spatio-timeslot
+
+        "pairs" binds 2 non-conflicting exams greedily, "dsatur" groups any number of them by graph colouring.
+        """
+        if method not in ("pairs", "dsatur"):
+            raise ValueError(f"unknown binding method: {method}")
+        bindings = None
+        # the largest available room limits the dsatur groups
+        options = (method, self.fixed_exams, self.room_caps, self.available_rooms())
+        if self.preprocess_cache is not None:
+            bindings = self.preprocess_cache.load_bindings(self.cache_key, *options)
+        if bindings is None:
+            bindings = self.pair_bindings() if method == "pairs" else self.colour_bindings()
+            if self.preprocess_cache is not None:
+                self.preprocess_cache.save_bindings(self.cache_key, *options, bindings)
 
-        self.no_conflict_exams_pairs = no_overlap_exams_pairs
-        self.conflict_exams_pairs = overlap_exams_pairs
+        self.bindings = bindings
+        self.compression_report = self.search_space_report(bindings)
+        return bindings
 
-    def generate_bindings(self):
-        """ Compress the exams - put 2 non-conflicting exams on the same day"""
+    def pair_bindings(self):
         bindings = {}  # the "key" exam will follow the "value" exam
-        free_exams = set(self.exam2students.keys())  # exams have not been bound with others
-        for exam_1, exam_2 in self.no_conflict_exams_pairs:
-            if exam_1 in free_exams and exam_2 in free_exams:
-                if exam_1 in self.fixed_exams:  # the "key" exam cannot be a fixed exam
-                    bindings[exam_2] = exam_1
-                else:
-                    bindings[exam_1] = exam_2
-                free_exams.remove(exam_1)
-                free_exams.remove(exam_2)
+        graph = self.conflict_graph
+        free_exams = np.ones(len(graph), dtype=bool)  # exams have not been bound with others
+        # pair each exam with the first free, non-conflicting exam after it (itertools.combinations order)
+        for i, exam_1 in enumerate(graph.exams):
+            if not free_exams[i]:
+                continue
+            j = graph.first_compatible(i, free_exams)
+            if j is None:
+                continue
+            exam_2 = graph.exams[j]
+            if exam_1 in self.fixed_exams:  # the "key" exam cannot be a fixed exam
+                bindings[exam_2] = exam_1
+            else:
+                bindings[exam_1] = exam_2
+            free_exams[i] = free_exams[j] = False
 
-        self.bindings = bindings
         return bindings
 
-    def optimize(self, kpi_coef, pop_size=100, crossover_rate=0, mutation_rate=0.5, num_generation=200):
+    def colour_bindings(self):
+        """group exams into independent sets of the conflict graph with DSATUR, each group fitting in one room
+
+        A group containing a fixed exam follows it and must fit in its room, other groups must fit in the largest
+        available room.
+        """
+        graph = self.conflict_graph
+        # only rooms with a free spatio-timeslot can hold a group
+        max_cap = max((self.room_caps[room] for room in self.available_rooms()), default=0)
+        sizes = [len(self.exam2students[exam]) for exam in graph.exams]
+        fixed_capacity = {graph.index[exam]: self.room_caps.get(spats[2], max_cap)
+                          for exam, spats in self.fixed_exams.items() if exam in graph.index}
+        bindings = {}  # the "key" exam will follow the "value" exam
+        for group in dsatur_groups(graph, sizes, max_cap, fixed_capacity):
+            # the fixed exam leads its group, otherwise the largest exam does
+            leader = group[0] if group[0] in fixed_capacity else max(group, key=lambda i: sizes[i])
+            bindings.update({graph.exams[i]: graph.exams[leader] for i in group if i != leader})
+        return bindings
+
+    def available_rooms(self):
+        """rooms with at least one free spatio-timeslot"""
+        return {spats[2] for spats in self.available_spatio_timeslots}
+
+    def search_space_report(self, bindings):
+        """size of the GA search space with and without the given bindings
+
+        The chromosome arranges the free exams over the available spatio-timeslots, i.e. one of
+        slots! / (slots - free exams)! distinct timetables, reported as log10.
+        """
+        num_slots = len(self.available_spatio_timeslots)
+        num_exams = len(set(self.exam2students) - set(self.fixed_exams))
+        num_free = len(set(self.exam2students) - set(self.fixed_exams) - set(bindings))
+
+        def log10_space(k):
+            return (math.lgamma(num_slots + 1) - math.lgamma(max(num_slots - k, 0) + 1)) / math.log(10)
+
+        return {"exams": num_exams, "free exams": num_free, "groups": num_free + len(self.fixed_exams),
+                "log10 search space before": log10_space(num_exams),
+                "log10 search space after": log10_space(num_free)}
+
+    def optimize(self, kpi_coef, pop_size=100, crossover_rate=0, mutation_rate=0.5, num_generation=200,
+                 evaluation=None, search=None, stop=None, checkpoint=None, warm_start=None, profile=False,
+                 progress=None, verbose=True):
+        """run the GA and return the best timetable
+
+        The options are EvaluationOptions, SearchOptions, StoppingCriteria, Checkpointing and WarmStart objects (see
+        options). progress is called with the logbook record and the hall of fame after every generation, with
+        profile the run is timed by a Profiler (kept in profiler), and with verbose the logbook is printed as the run
+        goes.
+        """
+        evaluation = evaluation or EvaluationOptions()
+        search = search or SearchOptions()
+        checkpoint = checkpoint or Checkpointing()
+        self.profiler = Profiler() if profile else None
+        saved = None
+        if checkpoint.resume_from is not None:
+            create_types()
+            saved = load_checkpoint(checkpoint.resume_from)
+            # the gene numbering must be the one the checkpointed individuals were encoded with
+            self.gene_exams = saved["gene_exams"]
+        toolbox = self.build_toolbox(kpi_coef, evaluation.engine, evaluation.batch, search.constructive_init,
+                                     search.repair)
+        if saved is not None and self.gene_exams != saved["gene_exams"]:
+            raise ValueError("the checkpoint was saved for a different set of exams")
+        previous, penalty = None, None
+        if warm_start is not None:
+            previous = warm_start.previous
+            if not isinstance(previous, dict):
+                previous = read_timetable(previous, list(self.room_caps))
+            if warm_start.move_penalty:
+                penalty = MovePenalty(self, previous, warm_start.move_penalty)
+                toolbox.register("evaluate", evaluate_penalized, evaluate=toolbox.evaluate, penalty=penalty)
+                if evaluation.batch:
+                    toolbox.register("evaluate_batch", evaluate_batch_penalized,
+                                     evaluate_batch=toolbox.evaluate_batch, penalty=penalty)
+        pool = EvaluationPool(evaluation.backend, evaluation.n_workers, toolbox.evaluate,
+                              getattr(toolbox, "evaluate_batch", None))
+        toolbox.register("map", pool.map)
+        if evaluation.batch:
+            # score all invalid individuals of a generation in one vectorized pass (per worker)
+            toolbox.register("evaluate_batch", pool.map_batch)
+        if search.memetic_every:
+            local_search = LocalSearch(self.build_evaluator(kpi_coef, incremental=True, gene_exams=self.gene_exams),
+                                       search.memetic_moves)
+            if penalty is not None:
+                local_search.evaluate = partial(evaluate_penalized, evaluate=local_search.evaluate, penalty=penalty)
+            toolbox.register("improve", local_search.improve_best, n_elite=search.memetic_elite)
+        if self.profiler is not None:
+            self.profiler.instrument(toolbox)
+
+        # create population (or restore it) and start evolving
+        if saved is None:
+            pop, hof, log, start_gen = [], tools.HallOfFame(1), None, 0
+            if previous is not None:
+                constraints = SlotConstraints(self.build_evaluator(kpi_coef, gene_exams=self.gene_exams))
+                chromosome = encode_timetable(self, previous, constraints)
+                n_warm = min(pop_size, max(1, round(pop_size * warm_start.fraction)))
+                pop = warm_population(creator.Individual, chromosome, n_warm, warm_start.perturbation)
+            pop += toolbox.population(n=pop_size - len(pop))
+        else:
+            pop, hof, log, start_gen = (saved[key] for key in ("population", "halloffame", "logbook", "generation"))
+            random.setstate(saved["rndstate"])
+        stats = self.ga_statistics()
+        cache = None
+        if evaluation.cache_size:
+            cache = FitnessCache(partial(gene_key, num_exams=len(self.gene_exams)), evaluation.cache_size)
+        with pool:
+            pop, log = ea_simple(pop, toolbox, cxpb=crossover_rate, mutpb=mutation_rate, ngen=num_generation,
+                                 stats=stats, halloffame=hof,
+                                 verbose=verbose, logbook=log, start_gen=start_gen,
+                                 checkpoint_path=checkpoint.path, checkpoint_every=checkpoint.every,
+                                 checkpoint_extra={"gene_exams": self.gene_exams},
+                                 stop=stop or StoppingCriteria(),
+                                 improve_every=search.memetic_every, cache=cache, profiler=self.profiler,
+                                 progress=progress)
+        self.ga_pop = pop
+        self.ga_log = log
+        self.stop_reason = log[-1]["stop"]
+        self.moved_exams = penalty.moved(hof[0]) if penalty is not None else None
+        return self.set_best(hof[0], hof[0].fitness.values[0])
+
+    def solve(self, kpi_coef, solver="annealing", n_restarts=1, seed=None, n_workers=None, evaluation=None,
+              search=None, guided=False, **solver_options):
+        """single-solution search instead of the GA - simulated annealing, tabu search or another TrajectorySolver
+        (see solvers) - from n_restarts independent starting timetables on up to n_workers processes, restart i
+        seeded with seed + i
+
+        The search uses the GA's chromosome and evaluation, so fixed exams, bindings and penalties mean the same. Of
+        the options (see options), the engine of evaluation applies, by default "delta" which only rescores the
+        students affected by each move, and the constructive_init of search. With guided, moves are drawn like
+        LocalSearch's (repair, then compress, then random swaps; numpy engines only) instead of at random.
+        solver_options go to the solver, e.g. max_evaluations, time_budget or tenure. Returns the best timetable,
+        the logbook of every restart is kept in ga_log.
+        """
+        evaluation = evaluation or EvaluationOptions("delta")
+        search = search or SearchOptions()
+        if evaluation.batch or evaluation.backend != "serial":
+            raise ValueError("the solvers score one move at a time, on the process of their restart")
+        if search.repair or search.memetic_every:
+            raise ValueError("repair and memetic steps only apply to the GA")
+        if guided and evaluation.engine == "python":
+            raise ValueError("guided moves require the numpy or delta engine")
+        solver = make_solver(solver, **solver_options)
+        toolbox = self.build_toolbox(kpi_coef, evaluation.engine, constructive_init=search.constructive_init)
+        propose = None
+        if guided:
+            propose = LocalSearch(self.build_evaluator(kpi_coef, gene_exams=self.gene_exams)).propose
+        results = run_restarts(solver, toolbox.chromosome, toolbox.evaluate, propose, n_restarts, seed, n_workers)
+        best, fitness, _, reason = max(results, key=lambda result: result[1][0])
+        self.ga_pop = [result[0] for result in results]
+        self.ga_log = [result[2] for result in results]
+        self.stop_reason = reason
+        return self.set_best(best, fitness[0])
+
+    def optimize_islands(self, kpi_coef, n_islands=4, pop_size=100, crossover_rate=0, mutation_rate=0.5,
+                         num_generation=200, migration_interval=20, migration_size=5, topology="ring", seed=None,
+                         n_workers=None, evaluation=None, search=None):
+        """island-model GA - n_islands sub-populations evolve on up to n_workers processes and exchange their best
+        individuals every migration_interval generations
+
+        mutation_rate may be a list with one rate per island. topology is "ring" or a DEAP migration array (island i
+        sends its emigrants to island topology[i]). Island i is seeded with seed + i. Each island evaluates on its
+        own process with the engine, batch and cache_size of evaluation, and the constructive_init and repair of
+        search (see options). Returns the global hall of fame and the per-island logbooks (also kept in ga_log,
+        while ga_pop holds the island populations).
+        """
+        evaluation = evaluation or EvaluationOptions()
+        search = search or SearchOptions()
+        if evaluation.backend != "serial":
+            raise ValueError("each island evaluates on its own process, the backend must be serial")
+        if search.memetic_every:
+            raise ValueError("memetic steps are not supported on islands")
+        hof, pops, logs = run_islands(self, kpi_coef, n_islands, pop_size, crossover_rate, mutation_rate,
+                                      num_generation, migration_interval, migration_size, topology, seed, n_workers,
+                                      evaluation, search)
+        self.ga_pop = pops
+        self.ga_log = logs
+        self.set_best(hof[0], hof[0].fitness.values[0])
+        return hof, logs
+
+    def optimize_pareto(self, objectives=KPI_SET, pop_size=100, crossover_rate=0, mutation_rate=0.5,
+                        num_generation=200, evaluation=None, search=None):
+        """multi-objective GA (NSGA-II) over the values of the given KPIs, all minimized, with the capacity and
+        conflicting-exam violations handled as a constraint (see ConstrainedFitness)
+
+        Scored with the numpy engine, whatever the engine of evaluation - its batch, backend, n_workers and
+        cache_size apply, as do the constructive_init and repair of search (see options). pop_size must be a
+        multiple of 4. Returns the non-dominated front as a list of ({kpi: value}, exam2spats), its individuals are
+        kept in pareto_front (pass one to set_best to adopt it).
+        """
+        evaluation = evaluation or EvaluationOptions()
+        search = search or SearchOptions()
+        if pop_size % 4:
+            raise ValueError("the population size of NSGA-II must be a multiple of 4")
+        if search.memetic_every:
+            raise ValueError("memetic steps are not supported by NSGA-II")
+        objectives = tuple(objectives)
+        no_coef = dict.fromkeys(KPI_SET, 0)
+        toolbox = self.build_toolbox(no_coef, "numpy", False, search.constructive_init, search.repair)
+        create_pareto_types(len(objectives))
+        toolbox.register("individual", tools.initIterate, creator.ParetoIndividual, toolbox.chromosome)
+        toolbox.register("population", tools.initRepeat, list, toolbox.individual)
+        evaluator = self.build_evaluator(no_coef, gene_exams=self.gene_exams)
+        toolbox.register("evaluate", evaluator.objectives, objectives=objectives)
+        pool = EvaluationPool(evaluation.backend, evaluation.n_workers, toolbox.evaluate,
+                              partial(evaluator.objectives_batch, objectives=objectives))
+        toolbox.register("map", pool.map)
+        if evaluation.batch:
+            toolbox.register("evaluate_batch", pool.map_batch)
+        toolbox.register("select", tools.selNSGA2)
+
+        stats = tools.Statistics(key=lambda ind: ind.fitness.values[0])
+        stats.register("min_violations", min)
+        stats.register("feasible", lambda violations: sum(v == 0 for v in violations))
+        front = tools.ParetoFront()
+        cache = None
+        if evaluation.cache_size:
+            cache = FitnessCache(partial(gene_key, num_exams=len(self.gene_exams)), evaluation.cache_size)
+        with pool:
+            pop, log = ea_nsga2(toolbox.population(n=pop_size), toolbox, pop_size, crossover_rate, mutation_rate,
+                                num_generation, stats=stats, halloffame=front, verbose=True, cache=cache)
+        self.ga_pop = pop
+        self.ga_log = log
+        self.pareto_front = list(front)
+        return [(dict(zip(objectives, ind.fitness.values[1:])),
+                 self.gen_full_table(self.available_spatio_timeslots, self.decode(ind, self.gene_exams),
+                                     self.fixed_exams, self.bindings))
+                for ind in front]
+
+    def build_toolbox(self, kpi_coef, engine="python", batch=False, constructive_init=False, repair=False):
+        """DEAP toolbox of the GA - chromosome, evaluation and variation operators
+
+        constructive_init builds the initial chromosomes greedily, avoiding capacity and conflict violations where
+        possible, and repair moves the violating exams of every offspring to free slots where they fit (see
+        SlotConstraints).
+        """
+        if batch and engine != "numpy":
+            raise ValueError("batched evaluation requires the numpy engine")
+        if engine not in ("python", "numpy", "delta"):
+            raise ValueError(f"unknown evaluation engine: {engine}")
 
         free_exams = list(set(self.exam2students.keys()) - set(self.fixed_exams.keys()) - set(self.bindings.keys()))
         if len(free_exams) > len(self.available_spatio_timeslots):
             raise ValueError("the number of exams exceeds the number of available spaces")
-        else:
-            num_no_exam = len(self.available_spatio_timeslots) - len(free_exams)
-            free_exams += [NO_EXAM_PLACEHOLDER] * num_no_exam
+        # keep an existing gene numbering, so that copies of this optimizer (e.g. in worker processes) agree on it
+        if self.gene_exams is None or set(self.gene_exams) != set(free_exams):
+            self.gene_exams = free_exams
+        num_genes = len(self.available_spatio_timeslots)
 
-        # define chromosome and individual
-        creator.create("Fitness", base.Fitness, weights=(1,))
-        creator.create("Individual", list, fitness=creator.Fitness)
+        # define chromosome and individual - a permutation of gene ids, one per spatio-timeslot
+        create_types()
         toolbox = base.Toolbox()
-        toolbox.register("chromosome", random.sample, free_exams, len(free_exams))
+        if constructive_init or repair:
+            constraints = SlotConstraints(self.build_evaluator(kpi_coef, gene_exams=self.gene_exams))
+        if constructive_init:
+            toolbox.register("chromosome", constraints.construct)
+        else:
+            toolbox.register("chromosome", random.sample, range(num_genes), num_genes)
         toolbox.register("individual", tools.initIterate, creator.Individual,
                          toolbox.chromosome)
         toolbox.register("population", tools.initRepeat, list, toolbox.individual)
         # define evaluation, mutation, crossover and selection methods
-        toolbox.register("evaluate", GAOptimizer.evaluate,
-                         fixed_exams=self.fixed_exams,
-                         bindings=self.bindings,
-                         available_spatio_timeslots=self.available_spatio_timeslots,
-                         student2exams=self.student2exams,
-                         exam2students=self.exam2students,
-                         week2date_dict=self.week2date_dict,
-                         kpi_coef=kpi_coef,
-                         room_caps=self.room_caps,
-                         conflict_exams_pairs=self.conflict_exams_pairs)
+        if engine == "python":
+            toolbox.register("evaluate", GAOptimizer.evaluate,
+                             gene_exams=self.gene_exams,
+                             fixed_exams=self.fixed_exams,
+                             bindings=self.bindings,
+                             available_spatio_timeslots=self.available_spatio_timeslots,
+                             student2exams=self.student2exams,
+                             exam2students=self.exam2students,
+                             week2date_dict=self.week2date_dict,
+                             kpi_coef=kpi_coef,
+                             room_caps=self.room_caps,
+                             conflict_graph=self.conflict_graph,
+                             profiler=self.profiler)
+        else:
+            evaluator = self.build_evaluator(kpi_coef, incremental=engine == "delta", gene_exams=self.gene_exams)
+            toolbox.register("evaluate", evaluator.evaluate)
+            if batch:
+                toolbox.register("evaluate_batch", evaluator.evaluate_batch)
         toolbox.register("mate", tools.cxPartialyMatched)
         toolbox.register("mutate", tools.mutShuffleIndexes, indpb=0.1)
         toolbox.register("select", tools.selTournament, tournsize=5)
+        if repair:
+            toolbox.decorate("mate", constraints.repaired)
+            toolbox.decorate("mutate", constraints.repaired)
+        return toolbox
 
-        # create population and start evolving
-        pop = toolbox.population(n=pop_size)
-        hof = tools.HallOfFame(1)
+    @staticmethod
+    def ga_statistics():
         stats = tools.Statistics(key=lambda ind: ind.fitness.values)
         stats.register("best", max)
-        pop, log = algorithms.eaSimple(pop, toolbox, cxpb=crossover_rate, mutpb=mutation_rate, ngen=num_generation,
-                                       stats=stats, halloffame=hof,
-                                       verbose=True)
-        self.ga_pop = pop
-        self.ga_log = log
-        self.arranged_exams = hof[0]
+        return stats
+
+    def set_best(self, individual, fitness=None):
+        """decode the best individual into arranged_exams and the full timetable exam2spats, keeping its fitness in
+        best_fitness"""
+        self.best_fitness = fitness
+        self.arranged_exams = self.decode(individual, self.gene_exams)
 
         exam2spats = self.gen_full_table(self.available_spatio_timeslots,
                                          self.arranged_exams,
@@ -177,6 +485,17 @@ class GAOptimizer:
         self.exam2spats = exam2spats
         return exam2spats
 
+    def build_evaluator(self, kpi_coef, incremental=False, gene_exams=None):
+        """compile the processed data into a FastEvaluator (same results as evaluate, computed with numpy)
+
+        With incremental=True, a DeltaEvaluator is returned which only rescores the students affected by mutation.
+        If gene_exams is given, the evaluator scores integer-encoded chromosomes, otherwise lists of exam codes.
+        """
+        evaluator_class = DeltaEvaluator if incremental else FastEvaluator
+        return evaluator_class(self.available_spatio_timeslots, self.fixed_exams, self.bindings, self.student2exams,
+                               self.exam2students, self.week2date_dict, kpi_coef, self.room_caps,
+                               self.conflict_graph, gene_exams=gene_exams)
+
     def get_kpis(self):
         return self.calculate_kpis(self.exam2spats, self.student2exams, self.week2date_dict)
 
@@ -188,7 +507,7 @@ class GAOptimizer:
         for exam, spats in self.exam2spats.items():
             if exam not in self.fixed_exams:
                 stu_n = len(self.exam2students[exam])
-                cap = room_caps[spats[2]]
+                cap = self.room_caps[spats[2]]
                 if stu_n > cap:
                     feasible = False
                     cap_feasible = False
@@ -196,50 +515,91 @@ class GAOptimizer:
                         f"exam {exam} is arrange to {spats} but capacity is not enough. student: {stu_n} while capacity: {cap}")
 
         # check feasibility - conflict exams
-        for e1, e2 in self.conflict_exams_pairs:
-            spats1, spats2 = self.exam2spats[e1], self.exam2spats[e2]
-            if spats1[0] == spats2[0] and spats1[1] == spats2[1]:
-                feasible = False
-                time_feasible = False
-                print(f"{e1} and {e2} are arranged on the same day and slot, but they are conflicting")
+        for e1, e2 in self.same_time_conflicts(self.exam2spats, self.conflict_graph):
+            feasible = False
+            time_feasible = False
+            print(f"{e1} and {e2} are arranged on the same day and slot, but they are conflicting")
         return feasible, cap_feasible, time_feasible
 
     def output_table(self, path="./data/optimized_table.csv"):
-        table = self.ts_table.fillna("")
-        table = table.astype(str)
-        for exam, spats in self.exam2spats.items():
-            row_idx = table.query(f'day == "{spats[0]}" & slot == "{spats[1]}"').index[0]
-            table.at[row_idx, spats[2]] = exam
-        table.to_csv(path, index=False)
+        """write the spatio-time table with the exams filled in, as CSV or (.parquet) Parquet"""
+        write_frame(fill_timetable(self.ts_table, self.exam2spats), path)
+
+    def student_kpi_table(self, exam2spats=None):
+        """per-student KPI values of a full timetable (by default the optimised one) - a DataFrame with a "student id"
+        column and one column per student KPI (those of STUDENT_KPIS), computed in one vectorized pass
+
+        The values are the contributions of each student to calculate_kpis. exam2spats may hold other codes than
+        exams (they are ignored) but must place every registered exam.
+        """
+        exam2spats = self.exam2spats if exam2spats is None else exam2spats
+        missing = [exam for exam in self.exam2students if exam not in exam2spats]
+        if missing:
+            raise ValueError(f"exams missing from the timetable: {missing}")
+        exams = list(exam2spats)
+        # every exam gets a slot of its own, at its spatio-timeslot
+        evaluator = FastEvaluator([exam2spats[exam] for exam in exams], {}, {}, self.student2exams,
+                                  self.exam2students, self.week2date_dict, {}, self.room_caps, None)
+        student_kpis = evaluator.student_kpis(evaluator.resolve_slots([exams]))[0]
+        table = pd.DataFrame(student_kpis, columns=list(STUDENT_KPIS))
+        table.insert(0, "student id", list(self.student2exams))
+        return table
+
+    def output_student_table(self, path="./data/student_table.csv", chunksize=10000):
+        """stream the KPI values and timetable (their exams' spatio-timeslots by day) of every student to CSV or
+        (.parquet) Parquet"""
+        kpi_table = self.student_kpi_table()
+        with RowWriter(path, ["student id", *STUDENT_KPIS, "exams"], chunksize) as writer:
+            for (student, registered_exams), kpis in zip(self.student2exams.items(),
+                                                         kpi_table[list(STUDENT_KPIS)].itertuples(index=False)):
+                student_exam_spatss = sorted((self.exam2spats[exam] for exam in registered_exams),
+                                             key=lambda x: x[0])
+                writer.write([student, *kpis, str(student_exam_spatss)])
 
     @staticmethod
     def evaluate(individual, fixed_exams: dict, bindings: dict, available_spatio_timeslots: list,
                  student2exams: dict, exam2students: dict, week2date_dict: dict, kpi_coef: dict,
-                 room_caps: dict, conflict_exams_pairs):
+                 room_caps: dict, conflict_graph, gene_exams=None, profiler=None):
+        stage = profiler.stage if profiler is not None else null_stage
+        if gene_exams is not None:
+            with stage("decode"):
+                individual = GAOptimizer.decode(individual, gene_exams)
         # combine three types of exams to get complete exam timetable
-        exam2spats = GAOptimizer.gen_full_table(available_spatio_timeslots, individual, fixed_exams, bindings)
+        with stage("gen_full_table"):
+            exam2spats = GAOptimizer.gen_full_table(available_spatio_timeslots, individual, fixed_exams, bindings)
 
-        kpi_value = GAOptimizer.calculate_kpis(exam2spats, student2exams, week2date_dict)
+        with stage("calculate_kpis"):
+            kpi_value = GAOptimizer.calculate_kpis(exam2spats, student2exams, week2date_dict)
 
         # calculate the weighted fitness
         fitness = sum(kpi_coef[kpi] * kpi_value[kpi] for kpi in KPI_SET)
 
-        # penalize capacity feasibility violation
-        for exam, spats in exam2spats.items():
-            if exam not in fixed_exams:
-                stu_n = len(exam2students[exam])
-                cap = room_caps[spats[2]]
-                if stu_n > cap:
-                    fitness -= INF
-
-        # penalize conflicting-exam feasibility violation
-        for e1, e2 in conflict_exams_pairs:
-            spats1, spats2 = exam2spats[e1], exam2spats[e2]
-            if spats1[0] == spats2[0] and spats1[1] == spats2[1]:
+        with stage("penalties"):
+            # penalize capacity feasibility violation
+            for exam, spats in exam2spats.items():
+                if exam not in fixed_exams:
+                    stu_n = len(exam2students[exam])
+                    cap = room_caps[spats[2]]
+                    if stu_n > cap:
+                        fitness -= INF
+
+            # penalize conflicting-exam feasibility violation
+            for _ in GAOptimizer.same_time_conflicts(exam2spats, conflict_graph):
                 fitness -= INF
 
         return fitness,
 
+    @staticmethod
+    def same_time_conflicts(exam2spats, conflict_graph):
+        """conflicting exam pairs arranged on the same day and slot"""
+        time2exams = {}
+        for exam, spats in exam2spats.items():
+            time2exams.setdefault((spats[0], spats[1]), []).append(exam)
+        for exams in time2exams.values():
+            for e1, e2 in combinations(exams, 2):
+                if conflict_graph.conflicts(e1, e2):
+                    yield e1, e2
+
     @staticmethod
     def calculate_kpis(exam2spats, student2exams, week2date_dict):
         # init kpi values
@@ -280,6 +640,12 @@ class GAOptimizer:
         kpi_value[KPI_EXAM_DURA] = last_exam_date
         return kpi_value
 
+    @staticmethod
+    def decode(individual, gene_exams):
+        """translate an integer-encoded chromosome back to exam codes (and placeholders)"""
+        num_exams = len(gene_exams)
+        return [gene_exams[gene] if gene < num_exams else NO_EXAM_PLACEHOLDER for gene in individual]
+
     @staticmethod
     def gen_full_table(available_spatio_timeslots, arranged_exams, fixed_exams, bindings):
         """combine three types of exams to get complete exam timetable"""
@@ -307,7 +673,8 @@ if __name__ == "__main__":
     # optimize
     exam_opt = GAOptimizer()
     exam_opt.initialize(timespace_file, rooms, room_caps, fixed_exams, regis_file, "CID")
-    exam_opt.optimize(kpi_coef, pop_size=100, mutation_rate=0.4, num_generation=800)
+    exam_opt.optimize(kpi_coef, pop_size=100, mutation_rate=0.4, num_generation=800,
+                      evaluation=EvaluationOptions(engine="numpy"))
     print(exam_opt.get_feasibility())
     print(exam_opt.get_kpis())
     exam_opt.output_table()
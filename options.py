@@ -0,0 +1,107 @@
+from evolution import StoppingCriteria
+
+
+class EvaluationOptions:
+    """How GAOptimizer.optimize scores individuals.
+
+    engine: "python", "numpy" or "delta" (numpy, rescoring only the students a change affects - which pays off for
+    the swaps of the memetic steps rather than for mutated offspring, see DeltaEvaluator)
+    batch: score all new individuals of a generation in one vectorized pass (numpy engine only)
+    backend, n_workers: run the evaluations serially, on threads or on processes (see EvaluationPool)
+    cache_size: memoize the fitness of this many distinct timetables (see FitnessCache), 0 turns the cache off
+    """
+
+    def __init__(self, engine="python", batch=False, backend="serial", n_workers=None, cache_size=10000):
+        if engine == "delta" and backend == "process":
+            # worker processes score copies of the chromosomes, the evaluator state could not travel back with them
+            raise ValueError("the delta engine cannot run on the process backend, use the numpy engine or threads")
+        self.engine = engine
+        self.batch = batch
+        self.backend = backend
+        self.n_workers = n_workers
+        self.cache_size = cache_size
+
+
+class SearchOptions:
+    """Extra operators of GAOptimizer.optimize.
+
+    constructive_init, repair: feasibility-preserving initialization and repair (see build_toolbox)
+    memetic_every, memetic_elite, memetic_moves: every memetic_every generations, improve the memetic_elite best
+    individuals by memetic_moves steps of local search (see LocalSearch)
+    """
+
+    def __init__(self, constructive_init=False, repair=False, memetic_every=None, memetic_elite=5, memetic_moves=50):
+        self.constructive_init = constructive_init
+        self.repair = repair
+        self.memetic_every = memetic_every
+        self.memetic_elite = memetic_elite
+        self.memetic_moves = memetic_moves
+
+
+class Checkpointing:
+    """Saving and resuming a run of GAOptimizer.optimize.
+
+    path: save the population, hall of fame, logbook and random state there every `every` generations
+    resume_from: continue a saved run exactly as if it had not been interrupted (given the same data and parameters)
+    """
+
+    def __init__(self, path=None, every=10, resume_from=None):
+        self.path = path
+        self.every = every
+        self.resume_from = resume_from
+
+
+class WarmStart:
+    """Seeding GAOptimizer.optimize from a previous timetable.
+
+    previous: exam2spats dict, or the path of a table written by output_table
+    fraction: share of the population that is the previous timetable (see encode_timetable) or a perturbation of it,
+    shuffling genes with probability perturbation
+    move_penalty: subtracted from the fitness for every exam moved off its previous day and slot
+    """
+
+    def __init__(self, previous, fraction=1.0, perturbation=0.05, move_penalty=0):
+        self.previous = previous
+        self.fraction = fraction
+        self.perturbation = perturbation
+        self.move_penalty = move_penalty
+
+
+# plain arguments of GAOptimizer.optimize
+GA_PARAMETERS = ("pop_size", "crossover_rate", "mutation_rate", "num_generation", "profile", "progress", "verbose")
+# flat option names, e.g. of a JSON config -> (argument of GAOptimizer.optimize, attribute of its options)
+FLAT_OPTIONS = {
+    "engine": ("evaluation", "engine"), "batch": ("evaluation", "batch"), "backend": ("evaluation", "backend"),
+    "n_workers": ("evaluation", "n_workers"), "cache_size": ("evaluation", "cache_size"),
+    "constructive_init": ("search", "constructive_init"), "repair": ("search", "repair"),
+    "memetic_every": ("search", "memetic_every"), "memetic_elite": ("search", "memetic_elite"),
+    "memetic_moves": ("search", "memetic_moves"),
+    "stagnation": ("stop", "stagnation"), "time_budget": ("stop", "time_budget"),
+    "target_fitness": ("stop", "target_fitness"), "max_evaluations": ("stop", "max_evaluations"),
+    "cancel_event": ("stop", "cancel_event"),
+    "checkpoint_path": ("checkpoint", "path"), "checkpoint_every": ("checkpoint", "every"),
+    "resume_from": ("checkpoint", "resume_from"),
+    "warm_start": ("warm_start", "previous"), "warm_fraction": ("warm_start", "fraction"),
+    "perturbation": ("warm_start", "perturbation"), "move_penalty": ("warm_start", "move_penalty"),
+}
+OPTION_CLASSES = {"evaluation": EvaluationOptions, "search": SearchOptions, "stop": StoppingCriteria,
+                  "checkpoint": Checkpointing, "warm_start": WarmStart}
+
+
+def optimize_arguments(**options):
+    """keyword arguments of GAOptimizer.optimize from flat option names (GA_PARAMETERS and FLAT_OPTIONS), e.g.
+    engine="numpy", stagnation=50 gives evaluation=EvaluationOptions(engine="numpy"), stop=StoppingCriteria(50) -
+    options set to None keep their default"""
+    unknown = set(options) - set(GA_PARAMETERS) - set(FLAT_OPTIONS)
+    if unknown:
+        raise ValueError(f"unknown GA options: {sorted(unknown)}")
+    options = {key: value for key, value in options.items() if value is not None}
+    arguments = {key: options[key] for key in GA_PARAMETERS if key in options}
+    groups = {}
+    for key, (group, attribute) in FLAT_OPTIONS.items():
+        if key in options:
+            groups.setdefault(group, {})[attribute] = options[key]
+    if "warm_start" in groups and "previous" not in groups["warm_start"]:
+        raise ValueError("warm_fraction, perturbation and move_penalty need warm_start")
+    arguments.update({group: OPTION_CLASSES[group](**values) for group, values in groups.items()})
+    return arguments
@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+BACKENDS = ("serial", "thread", "process")
+
+# state of a worker process of worker_pool, set once when the worker starts
+worker_state = {}
+
+
+def _init_worker(setup, state):
+    worker_state.clear()
+    worker_state.update(state)
+    if setup is not None:
+        worker_state.update(setup(**state))
+
+
+def worker_pool(n_workers=None, setup=None, **state):
+    """process pool whose workers find the given state in worker_state, sent to each worker once rather than with
+    every task - setup(**state), if given, runs in each worker and returns more state, e.g. a toolbox built there"""
+    return ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(setup, state))
+
+
+def _evaluate_in_worker(chromosome):
+    return worker_state["evaluate"](chromosome)
+
+
+def _evaluate_batch_in_worker(chromosomes):
+    return worker_state["evaluate_batch"](chromosomes)
+
+
+class EvaluationPool:
+    """Drop-in replacement of toolbox.map for scoring individuals serially, on threads or on processes.
+
+    The evaluation functions (and the registration data bound to them) are sent to each worker process once, through
+    worker_pool, so a task only carries the chromosome. Consequently, on the process backend map() always runs the
+    evaluate function given here, whatever function DEAP passes in. Results come back in input order, so a seeded run
+    gives the same results on every backend.
+    """
+
+    def __init__(self, backend="serial", n_workers=None, evaluate=None, evaluate_batch=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown parallel backend: {backend}, choose from {BACKENDS}")
+        self.backend = backend
+        self.n_workers = n_workers or os.cpu_count()
+        self.evaluate = evaluate
+        self.evaluate_batch = evaluate_batch
+        self.executor = None
+        if backend == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=self.n_workers)
+        elif backend == "process":
+            self.executor = worker_pool(self.n_workers, evaluate=evaluate, evaluate_batch=evaluate_batch)
+
+    def map(self, func, individuals):
+        if self.backend == "serial":
+            return list(map(func, individuals))
+        if self.backend == "thread":
+            return list(self.executor.map(func, individuals))
+        chromosomes = [list(ind) for ind in individuals]
+        chunksize = max(1, len(chromosomes) // (4 * self.n_workers))
+        return list(self.executor.map(_evaluate_in_worker, chromosomes, chunksize=chunksize))
+
+    def map_batch(self, individuals):
+        """split a batch into one chunk per worker and run evaluate_batch on each chunk"""
+        if self.backend == "serial" or len(individuals) < 2:
+            return self.evaluate_batch(individuals)
+        size = -(-len(individuals) // self.n_workers)
+        chunks = [individuals[i:i + size] for i in range(0, len(individuals), size)]
+        if self.backend == "thread":
+            results = self.executor.map(self.evaluate_batch, chunks)
+        else:
+            results = self.executor.map(_evaluate_batch_in_worker, [[list(ind) for ind in chunk] for chunk in chunks])
+        return [fit for result in results for fit in result]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
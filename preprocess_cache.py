@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from conflict_graph import ConflictGraph
+from export import json_default
+
+# bump when the layout of an entry changes, older entries are then ignored
+CACHE_VERSION = 1
+
+
+def file_digest(path, block_size=2 ** 20):
+    """sha256 of the content of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _options_digest(options):
+    return hashlib.sha256(json.dumps(options, sort_keys=True, default=json_default).encode()).hexdigest()
+
+
+def _csr(groups, index):
+    """(ptr, items) arrays of a sequence of collections, items encoded through index"""
+    groups = list(groups)
+    ptr = np.zeros(len(groups) + 1, dtype=np.int64)
+    ptr[1:] = np.cumsum([len(group) for group in groups])
+    items = np.fromiter((index[item] for group in groups for item in group), dtype=np.int64, count=ptr[-1])
+    return ptr, items
+
+
+def _sets(keys, ptr, items, values):
+    """{key: set(values)} from the CSR arrays written by _csr, elements inserted in their saved order"""
+    ptr, items = ptr.tolist(), items.tolist()
+    return {key: {values[i] for i in items[start:end]} for key, start, end in zip(keys, ptr[:-1], ptr[1:])}
+
+
+class PreprocessCache:
+    """On-disk cache of the preprocessed inputs of GAOptimizer - registrations, conflict graph, spatio-timeslots and
+    week2date_dict - and of the bindings generated from them.
+
+    An entry is a directory named after the content hashes of the spatio-time and registration files and the options
+    they were read with, so editing an input or changing an option simply misses the cache. It holds meta.json (exam
+    codes, student ids, timeslots, weeks) and one .npy file per array, loaded memory-mapped. Entries are written to a
+    temporary directory and renamed into place, so concurrent runs never see a partial entry. Stale entries are left
+    on disk, clear() removes them all.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+
+    def key(self, spatime_file, regis_datafile, **options):
+        options = {"version": CACHE_VERSION, "spatime": file_digest(spatime_file),
+                   "registration": file_digest(regis_datafile), **options}
+        return _options_digest(options)[:32]
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """the cached attributes of entry key as a dict, or None if there is no such entry"""
+        path = self.path(key)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        def array(name):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+        exams, students = meta["exams"], meta["students"]
+        return {
+            "available_spatio_timeslots": [tuple(spats) for spats in meta["available_spatio_timeslots"]],
+            "week2date_dict": {week: days for week, days in meta["week2date_dict"]},
+            "student2exams": _sets(students, array("student_ptr"), array("student_exams"), exams),
+            "exam2students": _sets(exams, array("exam_ptr"), array("exam_students"), students),
+            "conflict_graph": ConflictGraph.from_arrays([exams[i] for i in array("graph_exams").tolist()],
+                                                        {name: array(name) for name in ConflictGraph.ARRAYS}),
+        }
+
+    def save(self, key, optimizer):
+        """store the preprocessed attributes of optimizer as entry key"""
+        exams, students = list(optimizer.exam2students), list(optimizer.student2exams)
+        exam_index = {exam: i for i, exam in enumerate(exams)}
+        student_index = {student: i for i, student in enumerate(students)}
+        # exams only registered through student2exams, if any, still need an index
+        for registered_exams in optimizer.student2exams.values():
+            for exam in registered_exams:
+                if exam not in exam_index:
+                    exam_index[exam] = len(exams)
+                    exams.append(exam)
+        graph = optimizer.conflict_graph
+        arrays = {name: getattr(graph, name) for name in ConflictGraph.ARRAYS}
+        arrays["graph_exams"] = np.array([exam_index[exam] for exam in graph.exams], dtype=np.int64)
+        arrays["student_ptr"], arrays["student_exams"] = _csr(optimizer.student2exams.values(), exam_index)
+        arrays["exam_ptr"], arrays["exam_students"] = _csr(optimizer.exam2students.values(), student_index)
+        meta = {"exams": exams, "students": students,
+                "available_spatio_timeslots": optimizer.available_spatio_timeslots,
+                "week2date_dict": list(optimizer.week2date_dict.items())}
+        self._write(key, meta, arrays)
+
+    def _write(self, key, meta, arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=key + ".", dir=self.directory)
+        try:
+            for name, value in arrays.items():
+                np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(value))
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump(meta, f, default=json_default)
+            os.replace(tmp, self.path(key))
+        except OSError:
+            # another process stored the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(os.path.join(self.path(key), "meta.json")):
+                raise
+
+    def _bindings_path(self, key, method, fixed_exams, room_caps, rooms):
+        options = {"method": method, "fixed_exams": sorted(fixed_exams.items()), "room_caps": sorted(room_caps.items()),
+                   "rooms": sorted(rooms)}
+        return os.path.join(self.path(key), "bindings_" + _options_digest(options)[:16] + ".json")
+
+    def load_bindings(self, key, method, fixed_exams, room_caps, rooms):
+        """bindings cached for entry key with these binding options (rooms: those with a free spatio-timeslot), or
+        None"""
+        try:
+            with open(self._bindings_path(key, method, fixed_exams, room_caps, rooms)) as f:
+                return dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    def save_bindings(self, key, method, fixed_exams, room_caps, rooms, bindings):
+        path = self._bindings_path(key, method, fixed_exams, room_caps, rooms)
+        tmp = path + f".{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(list(bindings.items()), f, default=json_default)
+        os.replace(tmp, path)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,108 @@
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_NULL_STAGE = nullcontext()
+
+
+def null_stage(name):
+    """stand-in for Profiler.stage when profiling is off"""
+    return _NULL_STAGE
+
+
+def peak_memory_mb():
+    """peak resident memory of this process in MB, or None where it cannot be read"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class Profiler:
+    """Opt-in instrumentation of a GA run - cumulative time and call count per stage, plus per-generation wall time,
+    evaluations per second and peak memory.
+
+    Stages are timed with stage() or by wrapping toolbox operators (instrument). Stage times are inclusive, e.g.
+    "map" contains the "evaluate" calls it makes, and stages timed inside worker processes are not collected.
+    ea_simple adds the per-generation figures to the logbook as gen_time, evals_per_s and peak_mem_mb.
+    """
+
+    GENERATION_FIELDS = ("gen_time", "evals_per_s", "peak_mem_mb")
+    OPERATORS = ("select", "clone", "mate", "mutate", "map", "evaluate", "evaluate_batch", "improve")
+
+    def __init__(self):
+        self.times = {}
+        self.counts = {}
+        self.generations = []
+        self.evaluations = 0
+        self.elapsed = 0.0
+        self.generation_start = None
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def wrap(self, name, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def instrument(self, toolbox, names=OPERATORS):
+        """time the given operators of the toolbox, the ones not registered are skipped"""
+        for name in names:
+            if hasattr(toolbox, name):
+                setattr(toolbox, name, self.wrap(name, getattr(toolbox, name)))
+
+    def start_generation(self):
+        self.generation_start = time.perf_counter()
+
+    def end_generation(self, nevals):
+        """figures of the generation started by start_generation, as logbook columns"""
+        gen_time = time.perf_counter() - self.generation_start
+        self.evaluations += nevals
+        self.elapsed += gen_time
+        row = {"gen_time": gen_time, "evals_per_s": nevals / gen_time if gen_time else 0.0,
+               "peak_mem_mb": peak_memory_mb()}
+        self.generations.append(row)
+        return row
+
+    def summary(self):
+        """per-stage totals and the overall evaluation rate"""
+        stages = {name: {"calls": self.counts[name], "total_s": total, "mean_s": total / self.counts[name]}
+                  for name, total in sorted(self.times.items(), key=lambda item: -item[1])}
+        return {"stages": stages, "evaluations": self.evaluations, "elapsed_s": self.elapsed,
+                "evals_per_s": self.evaluations / self.elapsed if self.elapsed else 0.0,
+                "peak_mem_mb": peak_memory_mb()}
+
+    def to_json(self, path):
+        with open(path, "w") as f:
+            json.dump({**self.summary(), "generations": self.generations}, f, indent=2)
+
+    def to_csv(self, path, generations_path=None):
+        """write the per-stage totals to path and, optionally, the per-generation figures to generations_path"""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "calls", "total_s", "mean_s"])
+            for name, stage in self.summary()["stages"].items():
+                writer.writerow([name, stage["calls"], stage["total_s"], stage["mean_s"]])
+        if generations_path is not None:
+            with open(generations_path, "w", newline="") as f:
+                writer = csv.DictWriter(f, ["gen"] + list(self.GENERATION_FIELDS))
+                writer.writeheader()
+                for gen, row in enumerate(self.generations):
+                    writer.writerow({"gen": gen, **row})
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+def load_wide_registration(regis_datafile, id_column="ID", chunksize=5000):
+    """read a student x exam 0/1 matrix, return ({student_id: set(exams)}, {exam_code: set(students)})
+
+    The file is read in row chunks and each chunk is reduced to the coordinates of its nonzero cells straight away, so
+    the full matrix is never held in memory. Only exams with at least one registered student are kept.
+    """
+    student_ids, reg_rows, reg_cols = [], [], []
+    exam_codes = None
+    for chunk in pd.read_csv(regis_datafile, index_col=id_column, chunksize=chunksize):
+        exam_codes = chunk.columns
+        rows, cols = np.nonzero(chunk.to_numpy().astype(bool))
+        reg_rows.append(rows + len(student_ids))
+        reg_cols.append(cols)
+        student_ids += chunk.index.tolist()
+    if exam_codes is None:
+        return {}, {}
+    reg_rows, reg_cols = np.concatenate(reg_rows), np.concatenate(reg_cols)
+
+    # np.nonzero is row-major, so the registrations are already grouped by student
+    students = {}
+    splits = np.cumsum(np.bincount(reg_rows, minlength=len(student_ids)))[:-1]
+    for student_id, cols in zip(student_ids, np.split(reg_cols, splits)):
+        students[student_id] = set(exam_codes[cols])
+
+    exams = {}
+    order = np.argsort(reg_cols, kind="stable")
+    counts = np.bincount(reg_cols, minlength=len(exam_codes))
+    student_ids = np.array(student_ids, dtype=object)
+    for exam_code, count, rows in zip(exam_codes, counts, np.split(reg_rows[order], np.cumsum(counts)[:-1])):
+        # only arrange the exams for which at least one student registered
+        if count:
+            exams[exam_code] = set(student_ids[rows])
+    return students, exams
+
+
+def load_long_registration(regis_datafile, id_column="ID", exam_column="exam", chunksize=100000):
+    """read one (student, exam) registration per row, return ({student_id: set(exams)}, {exam_code: set(students)})
+
+    The file is streamed in chunks, so loading scales with the number of registrations. Students and exams are
+    ordered by first appearance.
+    """
+    students, exams = {}, {}
+    for chunk in pd.read_csv(regis_datafile, usecols=[id_column, exam_column], chunksize=chunksize):
+        for student_id, exam_code in zip(chunk[id_column].tolist(), chunk[exam_column].tolist()):
+            students.setdefault(student_id, set()).add(exam_code)
+            exams.setdefault(exam_code, set()).add(student_id)
+    return students, exams
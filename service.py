@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+
+from export import json_default
+from parallel import worker_pool, worker_state
+from sweep import prepare, scenario_arguments, scenario_optimizer, solve_scenario
+
+DEFAULT_PORT = 8765
+
+
+def _dataset(name, version, data):
+    """the prepared optimizer of a dataset, loaded once per worker process (a cache_dir makes that fast)"""
+    datasets = worker_state.setdefault("datasets", {})  # {(name, version): prepared GAOptimizer}
+    key = (name, version)
+    if key not in datasets:
+        for old_key in [k for k in datasets if k[0] == name]:
+            del datasets[old_key]
+        datasets[key] = prepare(**data)
+    return datasets[key]
+
+
+def _run_job(job_id, name, version, data, scenario, queue, cancel_event):
+    """run one job in a worker process, reporting its progress to the service through queue"""
+    opt = scenario_optimizer(scenario, _dataset(name, version, data))
+    queue.put({"job": job_id, "event": "started"})
+    best = {"fitness": None, "kpis": None}
+
+    def progress(record, halloffame):
+        fitness = halloffame[0].fitness.values[0]
+        if fitness != best["fitness"]:
+            # the KPIs are only recomputed when the best timetable changes
+            exam2spats = opt.gen_full_table(opt.available_spatio_timeslots, opt.decode(halloffame[0], opt.gene_exams),
+                                            opt.fixed_exams, opt.bindings)
+            best.update(fitness=fitness, kpis=opt.calculate_kpis(exam2spats, opt.student2exams, opt.week2date_dict))
+        queue.put({"job": job_id, "event": "generation", "gen": record["gen"], "nevals": record["nevals"],
+                   "best_fitness": fitness, "kpis": best["kpis"]})
+
+    row = solve_scenario(scenario, opt, progress=progress, cancel_event=cancel_event)
+    return {"summary": row, "timetable": opt.exam2spats}
+
+
+class Job:
+    def __init__(self, job_id, dataset, scenario, cancel_event):
+        self.id = job_id
+        self.dataset = dataset
+        self.scenario = scenario
+        self.cancel_event = cancel_event
+        self.status = "queued"  # then running, and finished, failed or cancelled
+        self.future = None
+        self.events = []  # progress events so far
+        self.watchers = set()  # asyncio queues of the connections watching the job
+        self.result = None
+        self.error = None
+
+    def info(self):
+        last = next((event for event in reversed(self.events) if event["event"] == "generation"), {})
+        return {"job": self.id, "dataset": self.dataset, "status": self.status, "gen": last.get("gen"),
+                "best_fitness": last.get("best_fitness"), "error": self.error}
+
+    def publish(self, event):
+        self.events.append(event)
+        for watcher in self.watchers:
+            watcher.put_nowait(event)
+
+
+class OptimizationService:
+    """Long-lived local optimisation service speaking JSON lines over TCP.
+
+    Datasets are registered once (see load) and prepared in each worker process on first use, then kept in memory -
+    with a cache_dir, the first preparation is read from a PreprocessCache. Jobs run on a pool of max_workers
+    processes, started once, so at most max_workers jobs run at a time and the others wait in the pool's queue.
+    Workers report every generation (best fitness and KPIs of the best timetable) through a multiprocessing queue,
+    and a job is cancelled either in the queue or, once running, after its current generation.
+
+    Each request is one JSON object on a line with an "op" and gets one response line with "ok", except "watch",
+    which first streams the job's progress events (lines with an "event") until the job ends:
+
+        {"op": "load", "name": ..., "data": {arguments of sweep.prepare}}
+        {"op": "submit", "dataset": ..., "kpi_coef": {...}, "fixed_exams": {exam: [day, slot, room]}, "seed": ...,
+         "bindings", "rooms", "room_caps" and any flat option of GAOptimizer.optimize} -> {"job": id}
+        {"op": "status", "job": id}, {"op": "jobs"}, {"op": "datasets"}
+        {"op": "watch", "job": id}, {"op": "result", "job": id}, {"op": "cancel", "job": id}
+    """
+
+    def __init__(self, max_workers=2, cache_dir=None):
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.datasets = {}  # name -> (version, arguments of prepare)
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        self.versions = itertools.count(1)
+        self.manager = None
+        self.queue = None
+        self.executor = None
+        self.dispatcher = None
+
+    async def start(self):
+        self.manager = multiprocessing.Manager()
+        self.queue = self.manager.Queue()
+        self.executor = worker_pool(self.max_workers)
+        self.dispatcher = asyncio.create_task(self.dispatch())
+
+    async def stop(self):
+        for job in self.jobs.values():
+            if job.status in ("queued", "running"):
+                self.cancel(job)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.queue.put, None)
+        await self.dispatcher
+        await loop.run_in_executor(None, self.executor.shutdown)
+        self.manager.shutdown()
+
+    async def dispatch(self):
+        """route the events of the workers' queue to the jobs, until the None sentinel"""
+        loop = asyncio.get_running_loop()
+        while True:
+            event = await loop.run_in_executor(None, self.queue.get)
+            if event is None:
+                return
+            job = self.jobs[event["job"]]
+            if event["event"] == "started":
+                job.status = "running"
+            elif event["event"] == "end":
+                self.finish(job)
+            else:
+                job.publish(event)
+
+    def finish(self, job):
+        """settle the job once its future is done and all its progress events have been dispatched"""
+        if job.future.cancelled():
+            job.status = "cancelled"
+        elif job.future.exception() is not None:
+            job.status, job.error = "failed", repr(job.future.exception())
+        else:
+            job.result = job.future.result()
+            job.status = "cancelled" if job.result["summary"]["stop"] == "cancelled" else "finished"
+        job.publish({"job": job.id, "event": "end", "status": job.status})
+
+    def load(self, name, data):
+        data = dict(data)
+        if self.cache_dir is not None:
+            data.setdefault("cache_dir", self.cache_dir)
+        self.datasets[name] = (next(self.versions), data)
+
+    def submit(self, dataset, scenario):
+        if dataset not in self.datasets:
+            raise KeyError(f"unknown dataset: {dataset}")
+        if "kpi_coef" not in scenario:
+            raise ValueError("a job needs kpi_coef")
+        scenario = dict(scenario)
+        scenario["fixed_exams"] = {exam: tuple(spats) for exam, spats in (scenario.get("fixed_exams") or {}).items()}
+        scenario_arguments(scenario)
+        version, data = self.datasets[dataset]
+        job = Job(next(self.job_ids), dataset, scenario, self.manager.Event())
+        job.future = self.executor.submit(_run_job, job.id, dataset, version, data, scenario, self.queue,
+                                          job.cancel_event)
+        # the end marker follows the worker's last event through the same queue
+        job.future.add_done_callback(lambda _: self.queue.put({"job": job.id, "event": "end"}))
+        self.jobs[job.id] = job
+        return job
+
+    def cancel(self, job):
+        if not job.future.cancel():
+            job.cancel_event.set()
+
+    def get_job(self, request):
+        job = self.jobs.get(request.get("job"))
+        if job is None:
+            raise KeyError(f"unknown job: {request.get('job')}")
+        return job
+
+    async def handle(self, request, send):
+        """answer one request, calling send for each line of the response"""
+        op = request.get("op")
+        if op == "load":
+            self.load(request["name"], request["data"])
+            return {"dataset": request["name"]}
+        if op == "datasets":
+            return {"datasets": {name: data for name, (_, data) in self.datasets.items()}}
+        if op == "submit":
+            scenario = {key: value for key, value in request.items() if key not in ("op", "dataset")}
+            return {"job": self.submit(request["dataset"], scenario).id}
+        if op == "jobs":
+            return {"jobs": [job.info() for job in self.jobs.values()]}
+        if op == "status":
+            return self.get_job(request).info()
+        if op == "cancel":
+            job = self.get_job(request)
+            self.cancel(job)
+            return job.info()
+        if op == "result":
+            job = self.get_job(request)
+            if job.result is None:
+                return {**job.info(), "summary": None}
+            return {**job.info(), **job.result}
+        if op == "watch":
+            job = self.get_job(request)
+            watcher = asyncio.Queue()
+            for event in job.events:
+                watcher.put_nowait(event)
+            job.watchers.add(watcher)
+            try:
+                # a finished job's events already end with its end event
+                while (event := await watcher.get())["event"] != "end":
+                    await send(event)
+            finally:
+                job.watchers.discard(watcher)
+            return job.info()
+        raise ValueError(f"unknown op: {op}")
+
+    async def serve_connection(self, reader, writer):
+        async def send(message):
+            writer.write(json.dumps(message, default=json_default).encode() + b"\n")
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                try:
+                    response = {"ok": True, **await self.handle(json.loads(line), send)}
+                except (KeyError, ValueError, TypeError) as e:
+                    response = {"ok": False, "error": str(e)}
+                await send(response)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT):
+        await self.start()
+        server = await asyncio.start_server(self.serve_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+async def request(message, host="127.0.0.1", port=DEFAULT_PORT):
+    """send one request to a running service, yield the lines of its response (the progress events of a watch,
+    then the final line with "ok")"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(json.dumps(message, default=json_default).encode() + b"\n")
+        await writer.drain()
+        while line := await reader.readline():
+            response = json.loads(line)
+            yield response
+            if "ok" in response:
+                return
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="local exam timetabling service (JSON lines over TCP)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=2, help="maximum number of jobs running at a time")
+    parser.add_argument("--cache-dir", default=None, help="directory of the preprocessing cache")
+    args = parser.parse_args()
+    asyncio.run(OptimizationService(args.workers, args.cache_dir).serve(args.host, args.port))
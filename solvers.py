@@ -0,0 +1,234 @@
+import math
+import random
+import time
+
+from deap import tools
+
+from constants import INF
+from parallel import worker_pool, worker_state
+
+
+class Chromosome(list):
+    """a chromosome that can carry the state a DeltaEvaluator caches on it (eval_state)"""
+
+
+def random_swap(chromosome):
+    """positions of two distinct random genes to swap"""
+    return random.sample(range(len(chromosome)), 2)
+
+
+class TrajectorySolver:
+    """Base of the single-solution engines - the search improves one chromosome by swapping pairs of genes.
+
+    Swaps keep the chromosome a permutation, so the placeholders, fixed exams and bindings mean the same as in the
+    GA, and the fitness (maximized, penalties included) comes from the same evaluate function. When evaluate is a
+    DeltaEvaluator's, the state it caches on the chromosome is restored with every rejected move, so that each move
+    only rescores the students it affects. propose(chromosome) picks the two positions of a move, random_swap by
+    default.
+
+    The search ends after max_evaluations evaluations or time_budget seconds. Every log_every evaluations, the
+    number of evaluations and the best and current fitness are recorded in a DEAP logbook.
+    """
+
+    def __init__(self, max_evaluations=10000, time_budget=None, log_every=100):
+        if max_evaluations is None and time_budget is None:
+            raise ValueError("a solver needs max_evaluations or time_budget")
+        self.max_evaluations = max_evaluations
+        self.time_budget = time_budget
+        self.log_every = log_every
+        self.evaluate = None
+        self.propose = None
+        self.evaluations = 0
+        self.start_time = None
+        self.best = None
+        self.best_fitness = None
+        self.current_fitness = None
+        self.logbook = None
+
+    def run(self, chromosome, evaluate, propose=None):
+        """search from the chromosome, return (best chromosome, its fitness, logbook, reason the search ended)"""
+        self.evaluate = evaluate
+        self.propose = propose or random_swap
+        self.evaluations = 0
+        self.start_time = time.perf_counter()
+        self.logbook = tools.Logbook()
+        self.logbook.header = ["evals", "best", "current"]
+        current = Chromosome(chromosome)
+        fitness = self.score(current)
+        self.best, self.best_fitness, self.current_fitness = list(current), fitness, fitness
+        reason = self.search(current, fitness)
+        self.logbook.record(evals=self.evaluations, best=self.best_fitness[0], current=self.current_fitness[0])
+        return self.best, self.best_fitness, self.logbook, reason
+
+    def search(self, current, fitness):
+        """improve the current chromosome of the given fitness, return the reason the search ended"""
+        raise NotImplementedError
+
+    def score(self, chromosome):
+        self.evaluations += 1
+        return tuple(self.evaluate(chromosome))
+
+    def swap(self, chromosome, p, q):
+        """apply the move, return its fitness and the evaluator state to restore to undo it"""
+        state = getattr(chromosome, "eval_state", None)
+        chromosome[p], chromosome[q] = chromosome[q], chromosome[p]
+        return self.score(chromosome), state
+
+    @staticmethod
+    def undo(chromosome, p, q, state):
+        chromosome[p], chromosome[q] = chromosome[q], chromosome[p]
+        if state is not None:
+            chromosome.eval_state = state
+
+    def accepted(self, current, fitness):
+        """account for the fitness of the current chromosome after a move"""
+        self.current_fitness = fitness
+        if fitness[0] > self.best_fitness[0]:
+            self.best, self.best_fitness = list(current), fitness
+        if self.log_every and self.evaluations % self.log_every == 0:
+            self.logbook.record(evals=self.evaluations, best=self.best_fitness[0], current=fitness[0])
+
+    def progress(self):
+        """share of the budget spent, from 0 to 1"""
+        shares = []
+        if self.max_evaluations is not None:
+            shares.append(self.evaluations / self.max_evaluations)
+        if self.time_budget is not None:
+            shares.append((time.perf_counter() - self.start_time) / self.time_budget)
+        return min(max(shares), 1.0)
+
+    def spent(self):
+        """the reason to stop, or None"""
+        if self.max_evaluations is not None and self.evaluations >= self.max_evaluations:
+            return "evaluation budget spent"
+        if self.time_budget is not None and time.perf_counter() - self.start_time >= self.time_budget:
+            return "time budget spent"
+        return None
+
+
+class SimulatedAnnealing(TrajectorySolver):
+    """Simulated annealing - a move is always accepted if it does not make the fitness worse, and otherwise with
+    probability exp(delta / temperature).
+
+    The temperature cools geometrically from start_temperature to start_temperature * end_ratio as the budget is
+    spent. By default start_temperature is the mean fitness loss of sample_moves random worsening moves, ignoring
+    the INF penalty steps, so that such a move is first accepted with probability about 1/e.
+    """
+
+    def __init__(self, max_evaluations=10000, time_budget=None, log_every=100, start_temperature=None,
+                 end_ratio=1e-3, sample_moves=50):
+        super().__init__(max_evaluations, time_budget, log_every)
+        self.start_temperature = start_temperature
+        self.end_ratio = end_ratio
+        self.sample_moves = sample_moves
+
+    def estimate_temperature(self, current, fitness):
+        losses = []
+        for _ in range(self.sample_moves):
+            p, q = self.propose(current)
+            new, state = self.swap(current, p, q)
+            self.undo(current, p, q, state)
+            loss = fitness[0] - new[0]
+            if 0 < loss < INF / 2:
+                losses.append(loss)
+        return sum(losses) / len(losses) if losses else 1.0
+
+    def search(self, current, fitness):
+        start_temperature = self.start_temperature or self.estimate_temperature(current, fitness)
+        while (reason := self.spent()) is None:
+            temperature = start_temperature * self.end_ratio ** self.progress()
+            p, q = self.propose(current)
+            new, state = self.swap(current, p, q)
+            delta = new[0] - fitness[0]
+            if delta >= 0 or random.random() < math.exp(delta / temperature):
+                fitness = new
+            else:
+                self.undo(current, p, q, state)
+            self.accepted(current, fitness)
+        return reason
+
+
+class TabuSearch(TrajectorySolver):
+    """Tabu search - every step samples n_candidates moves and makes the best one, even if it makes the fitness
+    worse, then forbids swapping the two positions again for tenure steps. A tabu move is still allowed if it would
+    give a new best fitness (aspiration).
+
+    Swaps of two equal genes (e.g. two "no_exam_today" placeholders) would not change the timetable, they are drawn
+    again, up to max_draws times n_candidates draws per step.
+    """
+
+    def __init__(self, max_evaluations=10000, time_budget=None, log_every=100, tenure=20, n_candidates=30,
+                 max_draws=10):
+        super().__init__(max_evaluations, time_budget, log_every)
+        self.tenure = tenure
+        self.n_candidates = n_candidates
+        self.max_draws = max_draws
+
+    def search(self, current, fitness):
+        tabu_until = {}  # position -> last step it may not be swapped
+        step = 0
+        while (reason := self.spent()) is None:
+            step += 1
+            best_move = None
+            candidates = 0
+            for _ in range(self.max_draws * self.n_candidates):
+                p, q = self.propose(current)
+                if current[p] == current[q]:
+                    continue
+                candidates += 1
+                tabu = tabu_until.get(p, 0) >= step or tabu_until.get(q, 0) >= step
+                new, state = self.swap(current, p, q)
+                new_state = getattr(current, "eval_state", None)
+                self.undo(current, p, q, state)
+                if (not tabu or new[0] > self.best_fitness[0]) and (best_move is None or new[0] > best_move[0][0]):
+                    best_move = (new, p, q, new_state)
+                if candidates == self.n_candidates or self.spent() is not None:
+                    break
+            if best_move is None:
+                if not candidates:
+                    return "no moves"
+                continue
+            fitness, p, q, new_state = best_move
+            current[p], current[q] = current[q], current[p]
+            if new_state is not None:
+                current.eval_state = new_state
+            tabu_until[p] = tabu_until[q] = step + self.tenure
+            self.accepted(current, fitness)
+        return reason
+
+
+SOLVERS = {"annealing": SimulatedAnnealing, "tabu": TabuSearch}
+
+
+def make_solver(solver, **options):
+    """a solver given by name (one of SOLVERS) and options, or a TrajectorySolver instance as is"""
+    if isinstance(solver, TrajectorySolver):
+        return solver
+    if solver not in SOLVERS:
+        raise ValueError(f"unknown solver: {solver}, choose from {tuple(SOLVERS)}")
+    return SOLVERS[solver](**options)
+
+
+def _run_restart(solver, seed):
+    random.seed(seed)
+    return solver.run(worker_state["initial"](), worker_state["evaluate"], worker_state["propose"])
+
+
+def run_restarts(solver, initial, evaluate, propose=None, n_restarts=1, seed=None, n_workers=None):
+    """run n_restarts independent searches, each from a chromosome drawn by initial(), on up to n_workers processes
+
+    Restart i is seeded with seed + i, so the results do not depend on the number of workers. The functions are sent
+    to each worker process once. Returns the (best chromosome, fitness, logbook, stop reason) of every restart, in
+    order.
+    """
+    base_seed = random.randrange(2 ** 32) if seed is None else seed
+    seeds = [base_seed + i for i in range(n_restarts)]
+    if n_restarts == 1 or n_workers == 1:
+        results = []
+        for restart_seed in seeds:
+            random.seed(restart_seed)
+            results.append(solver.run(initial(), evaluate, propose))
+        return results
+    with worker_pool(min(n_restarts, n_workers or n_restarts), initial=initial, evaluate=evaluate,
+                     propose=propose) as executor:
+        return list(executor.map(_run_restart, [solver] * n_restarts, seeds))
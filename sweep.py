@@ -0,0 +1,138 @@
+import argparse
+import contextlib
+import copy
+import io
+import itertools
+import json
+import random
+import time
+
+import pandas as pd
+
+from new import GAOptimizer
+from options import optimize_arguments
+from parallel import worker_pool, worker_state
+
+# what a scenario sets besides the flat options of GAOptimizer.optimize (see options.optimize_arguments)
+SCENARIO_KEYS = ("name", "kpi_coef", "fixed_exams", "seed", "bindings", "rooms", "room_caps")
+
+
+def prepare(spatime_file, rooms, room_caps, regis_datafile, id_col="ID", exam_col=None, cache_dir=None):
+    """read the spatio-time table and the registrations and build the conflict graph, once for all scenarios"""
+    optimizer = GAOptimizer()
+    optimizer.initialize(spatime_file, rooms, room_caps, {}, regis_datafile, id_col=id_col, exam_col=exam_col,
+                         cache_dir=cache_dir)
+    return optimizer
+
+
+def scenario_grid(**options):
+    """scenarios for every combination of the given options, e.g.
+    scenario_grid(kpi_coef=[coef_1, coef_2], rooms=[None, ("R060", "R064")], seed=[0, 1]) gives 8 scenarios"""
+    names = list(options)
+    return [dict(zip(names, values)) for values in itertools.product(*(options[name] for name in names))]
+
+
+def scenario_optimizer(scenario, optimizer):
+    """shallow copy of the prepared optimizer with the scenario's fixed exams, rooms, room capacities and bindings"""
+    opt = copy.copy(optimizer)
+    opt.fixed_exams = dict(scenario.get("fixed_exams") or {})
+    opt.room_caps = {**optimizer.room_caps, **(scenario.get("room_caps") or {})}
+    if scenario.get("rooms") is not None:
+        rooms = set(scenario["rooms"])
+        opt.available_spatio_timeslots = [spats for spats in optimizer.available_spatio_timeslots
+                                          if spats[2] in rooms]
+    opt.bindings, opt.gene_exams = {}, None
+    if scenario.get("bindings"):
+        opt.generate_bindings(scenario["bindings"])
+    return opt
+
+
+def _scenario_row(scenario):
+    """the columns of the results table that describe the scenario"""
+    return {"name": scenario.get("name"), "seed": scenario.get("seed"), "bindings": scenario.get("bindings"),
+            "rooms": " ".join(scenario["rooms"]) if scenario.get("rooms") is not None else "all",
+            "fixed_exams": len(scenario.get("fixed_exams") or {})}
+
+
+def scenario_arguments(scenario, **optimize_options):
+    """keyword arguments of GAOptimizer.optimize from the keys of a scenario other than SCENARIO_KEYS, updated with
+    optimize_options - all flat options (see optimize_arguments, which raises ValueError on unknown ones)"""
+    options = {key: value for key, value in scenario.items() if key not in SCENARIO_KEYS}
+    return optimize_arguments(**{**options, **optimize_options})
+
+
+def solve_scenario(scenario, opt, **optimize_options):
+    """run the GA of a scenario on its optimizer (see scenario_optimizer), return the scenario's row of the results
+    table - optimize_options are flat options of GAOptimizer.optimize too, e.g. progress and cancel_event"""
+    arguments = scenario_arguments(scenario, verbose=False, **optimize_options)
+    row = _scenario_row(scenario)
+    random.seed(scenario.get("seed"))
+    start = time.perf_counter()
+    opt.optimize(scenario["kpi_coef"], **arguments)
+    # get_feasibility prints every violation
+    with contextlib.redirect_stdout(io.StringIO()):
+        feasible, cap_feasible, time_feasible = opt.get_feasibility()
+    row.update(best_fitness=opt.best_fitness, feasible=feasible, cap_feasible=cap_feasible,
+               time_feasible=time_feasible, generations=opt.ga_log[-1]["gen"], stop=opt.stop_reason,
+               seconds=time.perf_counter() - start)
+    row.update(opt.get_kpis())
+    return row
+
+
+def run_scenario(scenario, optimizer=None):
+    """run the GA on one scenario and return its row of the results table
+
+    A scenario is a dict with kpi_coef and, optionally, name, fixed_exams, rooms (a subset of the prepared rooms),
+    room_caps (overriding the prepared ones), bindings (None, "pairs" or "dsatur"), seed and any flat option of
+    GAOptimizer.optimize (see scenario_arguments).
+    The shared optimizer is not modified. A scenario that raises gets a row with status "failed" and the error, so
+    that it does not abort the rest of a sweep.
+    """
+    base = optimizer if optimizer is not None else worker_state["optimizer"]
+    try:
+        row = solve_scenario(scenario, scenario_optimizer(scenario, base))
+    except Exception as e:
+        return {**_scenario_row(scenario), "status": "failed", "error": f"{type(e).__name__}: {e}"}
+    return {**row, "status": "ok", "error": None}
+
+
+def run_sweep(optimizer, scenarios, n_workers=None, out=None):
+    """run the scenarios concurrently on a process pool, return the results as a DataFrame (one row per scenario)
+
+    The preprocessed optimizer (see prepare) is sent to each worker once and shared read-only by its scenarios.
+    Failed scenarios are reported in the status and error columns. With out, the table is also written to that CSV
+    file.
+    """
+    with worker_pool(n_workers, optimizer=optimizer) as executor:
+        rows = list(executor.map(run_scenario, scenarios))
+    results = pd.DataFrame(rows)
+    if out is not None:
+        results.to_csv(out, index=False)
+    return results
+
+
+def load_config(path):
+    """read a sweep config - {"data": arguments of prepare, "grid": options of scenario_grid, "ga": GA options
+    common to all scenarios} - JSON lists standing for tuples (fixed exam spatio-timeslots) are converted back"""
+    with open(path) as f:
+        config = json.load(f)
+    grid = dict(config["grid"])
+    if "fixed_exams" in grid:
+        grid["fixed_exams"] = [{exam: tuple(spats) for exam, spats in fixed.items()} for fixed in grid["fixed_exams"]]
+    scenarios = [{**config.get("ga", {}), **scenario} for scenario in scenario_grid(**grid)]
+    for i, scenario in enumerate(scenarios):
+        scenario.setdefault("name", f"scenario_{i}")
+        # rejects unknown options before any scenario runs
+        scenario_arguments(scenario)
+    return config["data"], scenarios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="run a grid of exam timetabling scenarios on shared preprocessing")
+    parser.add_argument("config", help="JSON file with data, grid and ga sections")
+    parser.add_argument("--out", default="sweep_results.csv")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    data, scenarios = load_config(args.config)
+    results = run_sweep(prepare(**data), scenarios, args.workers, args.out)
+    print(results.to_string(index=False))
@@ -0,0 +1,42 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from conflict_graph import ConflictGraph, dsatur_groups
+from conftest import make_optimizer
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_dsatur_groups_are_independent_and_fit(seed):
+    rng = random.Random(seed)
+    exams = [f"E{i}" for i in range(40)]
+    student2exams = {f"S{s}": set(rng.sample(exams, rng.randint(1, 4))) for s in range(200)}
+    exam2students = {exam: {s for s, registered in student2exams.items() if exam in registered} for exam in exams}
+    graph = ConflictGraph(exam2students, student2exams)
+    sizes = [len(exam2students[exam]) for exam in graph.exams]
+    capacity = 40
+    fixed_capacity = {0: 30, 1: 60}
+    groups = dsatur_groups(graph, sizes, capacity, fixed_capacity)
+
+    assert sorted(i for group in groups for i in group) == list(range(len(graph)))
+    for group in groups:
+        assert not any(graph.conflicts(graph.exams[i], graph.exams[j]) for i, j in combinations(group, 2))
+        fixed = [i for i in group if i in fixed_capacity]
+        assert len(fixed) <= 1
+        # a lone exam may be larger than the room
+        if len(group) > 1:
+            assert sum(sizes[i] for i in group) <= (fixed_capacity[fixed[0]] if fixed else capacity)
+
+
+def test_colour_bindings_fit_the_rooms(instance):
+    opt = make_optimizer(instance, "dsatur")
+    groups = {}
+    for exam, leader in opt.bindings.items():
+        groups.setdefault(leader, [leader]).append(exam)
+    assert groups and not set(opt.bindings) & set(opt.fixed_exams)
+    max_cap = max(opt.room_caps[room] for room in opt.available_rooms())
+    for leader, group in groups.items():
+        assert not any(opt.exam2students[e1] & opt.exam2students[e2] for e1, e2 in combinations(group, 2))
+        cap = opt.room_caps[opt.fixed_exams[leader][2]] if leader in opt.fixed_exams else max_cap
+        assert sum(len(opt.exam2students[exam]) for exam in group) <= cap
@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+from benchmark import KPI_COEF
+from conftest import make_optimizer
+from options import Checkpointing, EvaluationOptions
+
+
+def run(instance, num_generation, checkpoint=None):
+    opt = make_optimizer(instance, "pairs")
+    random.seed(7)
+    opt.optimize(KPI_COEF, pop_size=20, mutation_rate=0.4, num_generation=num_generation,
+                 evaluation=EvaluationOptions("numpy"), checkpoint=checkpoint)
+    return opt
+
+
+def test_resumed_run_is_identical(instance, tmp_path):
+    path = str(tmp_path / "run.pkl")
+    straight = run(instance, 12)
+    run(instance, 6, Checkpointing(path))
+    resumed = run(instance, 12, Checkpointing(resume_from=path))
+    assert resumed.ga_log.select("best") == straight.ga_log.select("best")
+    assert resumed.exam2spats == straight.exam2spats
+    assert [list(ind) for ind in resumed.ga_pop] == [list(ind) for ind in straight.ga_pop]
+
+
+def test_checkpoint_of_other_exams_is_rejected(instance, tmp_path):
+    path = str(tmp_path / "run.pkl")
+    run(instance, 2, Checkpointing(path))
+    opt = make_optimizer(instance)
+    opt.exam2students = {exam: students for exam, students in opt.exam2students.items()
+                         if exam not in list(opt.exam2students)[:3]}
+    with pytest.raises(ValueError, match="different set of exams"):
+        opt.optimize(KPI_COEF, pop_size=20, num_generation=4, checkpoint=Checkpointing(resume_from=path))
@@ -0,0 +1,56 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from conflict_graph import ConflictGraph
+from conftest import make_optimizer
+
+
+@pytest.fixture
+def registrations():
+    rng = random.Random(3)
+    exams = [f"E{i}" for i in range(25)]
+    student2exams = {f"S{s}": set(rng.sample(exams, rng.randint(0, 6))) for s in range(120)}
+    exam2students = {exam: {s for s, registered in student2exams.items() if exam in registered} for exam in exams}
+    return exam2students, student2exams
+
+
+def test_edges_match_set_intersections(registrations):
+    exam2students, student2exams = registrations
+    graph = ConflictGraph(exam2students, student2exams)
+    expected = [(i, j) for i, j in combinations(exam2students, 2) if exam2students[i] & exam2students[j]]
+    assert list(graph.edges()) == expected
+    for i, j in combinations(exam2students, 2):
+        shared = len(exam2students[i] & exam2students[j])
+        assert graph.conflicts(i, j) == graph.conflicts(j, i) == bool(shared)
+        assert graph.shared_students(i, j) == graph.shared_students(j, i) == shared
+    for exam in exam2students:
+        neighbors = [other for other in exam2students if other != exam and exam2students[exam] & exam2students[other]]
+        assert graph.neighbors(exam) == neighbors
+        assert graph.degree(exam) == len(neighbors)
+    assert not graph.conflicts("E0", "unknown")
+
+
+def test_graph_is_rebuilt_from_its_arrays(registrations):
+    exam2students, student2exams = registrations
+    graph = ConflictGraph(exam2students, student2exams)
+    rebuilt = ConflictGraph.from_arrays(graph.exams, {name: getattr(graph, name) for name in ConflictGraph.ARRAYS})
+    assert list(rebuilt.edges()) == list(graph.edges())
+    assert [rebuilt.neighbors(exam) for exam in exam2students] == [graph.neighbors(exam) for exam in exam2students]
+
+
+def test_pair_bindings_match_the_greedy_pairing(instance):
+    opt = make_optimizer(instance)
+    # the pairing of the original generate_bindings, over the non-conflicting pairs in combinations order
+    expected, free_exams = {}, set(opt.exam2students)
+    for exam_1, exam_2 in combinations(opt.exam2students, 2):
+        if opt.exam2students[exam_1] & opt.exam2students[exam_2]:
+            continue
+        if exam_1 in free_exams and exam_2 in free_exams:
+            if exam_1 in opt.fixed_exams:
+                expected[exam_2] = exam_1
+            else:
+                expected[exam_1] = exam_2
+            free_exams -= {exam_1, exam_2}
+    assert opt.pair_bindings() == expected
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from benchmark import KPI_COEF
+from conftest import make_optimizer
+from new import GAOptimizer
+
+
+def reference_fitness(opt, chromosome):
+    return GAOptimizer.evaluate(chromosome, opt.fixed_exams, opt.bindings, opt.available_spatio_timeslots,
+                                opt.student2exams, opt.exam2students, opt.week2date_dict, KPI_COEF, opt.room_caps,
+                                opt.conflict_graph, gene_exams=opt.gene_exams)
+
+
+@pytest.mark.parametrize("bindings", [None, "pairs", "dsatur"])
+def test_evaluators_match_reference(instance, bindings):
+    opt = make_optimizer(instance, bindings)
+    toolbox = opt.build_toolbox(KPI_COEF, "delta")
+    random.seed(0)
+    population = toolbox.population(n=20)
+    expected = [tuple(reference_fitness(opt, ind)) for ind in population]
+
+    fast = opt.build_evaluator(KPI_COEF, gene_exams=opt.gene_exams)
+    assert [tuple(fast.evaluate(ind)) for ind in population] == expected
+    assert [tuple(fitness) for fitness in fast.evaluate_batch(population)] == expected
+
+    # the delta evaluator rescoring mutated offspring from the state cached on their parents
+    assert [tuple(toolbox.evaluate(ind)) for ind in population] == expected
+    for ind in population[:5]:
+        for _ in range(10):
+            ind = toolbox.mutate(toolbox.clone(ind))[0]
+            assert tuple(toolbox.evaluate(ind)) == tuple(reference_fitness(opt, ind))
+        # single swaps, rescored from the state rather than in full
+        for _ in range(10):
+            ind = toolbox.clone(ind)
+            p, q = random.sample(range(len(ind)), 2)
+            ind[p], ind[q] = ind[q], ind[p]
+            assert tuple(toolbox.evaluate(ind)) == tuple(reference_fitness(opt, ind))
+
+
+def test_day_masks_match_sorted_days(instance):
+    opt = make_optimizer(instance, "pairs")
+    toolbox = opt.build_toolbox(KPI_COEF, "numpy")
+    random.seed(0)
+    fast = opt.build_evaluator(KPI_COEF, gene_exams=opt.gene_exams)
+    day_of = fast.slot_day[fast.resolve_slots(toolbox.population(n=20))]
+    expected = fast.sorted_day_kpis(day_of, fast.student_ptr, fast.reg_exam)
+    assert (fast.day_mask_kpis(day_of, fast.student_ptr, fast.reg_exam, fast.reg_columns) == expected).all()
+    assert (fast.day_mask_kpis(day_of, fast.student_ptr, fast.reg_exam) == expected).all()
@@ -0,0 +1,32 @@
+import random
+
+import pandas as pd
+import pytest
+
+from benchmark import KPI_COEF
+from conftest import make_optimizer
+from export import fill_timetable
+
+
+def query_timetable(ts_table, exam2spats):
+    """the original output_table - one DataFrame.query per exam"""
+    table = ts_table.fillna("")
+    table = table.astype(str)
+    for exam, spats in exam2spats.items():
+        row_idx = table.query(f'day == "{spats[0]}" & slot == "{spats[1]}"').index[0]
+        table.at[row_idx, spats[2]] = exam
+    return table
+
+
+@pytest.mark.parametrize("bindings", [None, "dsatur"])
+def test_fill_timetable_matches_queries(instance, bindings, tmp_path):
+    opt = make_optimizer(instance, bindings)
+    toolbox = opt.build_toolbox(KPI_COEF, "numpy")
+    random.seed(0)
+    opt.set_best(toolbox.population(n=1)[0])
+    expected = query_timetable(opt.ts_table, opt.exam2spats)
+    pd.testing.assert_frame_equal(fill_timetable(opt.ts_table, opt.exam2spats), expected)
+
+    opt.output_table(tmp_path / "timetable.csv")
+    expected.to_csv(tmp_path / "expected.csv", index=False)
+    assert (tmp_path / "timetable.csv").read_text() == (tmp_path / "expected.csv").read_text()
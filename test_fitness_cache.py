@@ -0,0 +1,48 @@
+from deap import base, creator
+
+from evolution import evaluate_invalid
+from fitness_cache import FitnessCache, gene_key
+
+creator.create("CacheFitness", base.Fitness, weights=(1,))
+creator.create("CacheIndividual", list, fitness=creator.CacheFitness)
+
+
+def counting_toolbox(calls):
+    toolbox = base.Toolbox()
+    toolbox.register("evaluate", lambda ind: calls.append(list(ind)) or (float(sum(ind)),))
+    toolbox.register("map", map)
+    return toolbox
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = FitnessCache(maxsize=2)
+    cache.put((1,), (1.0,))
+    cache.put((2,), (2.0,))
+    assert cache.get((1,)) == (1.0,)
+    cache.put((3,), (3.0,))
+    assert cache.get((2,)) is None
+    assert len(cache) == 2
+    assert cache.take_hit_rate() == 0.5
+    assert cache.take_hit_rate() == 0.0
+
+
+def test_placeholders_share_a_key():
+    assert gene_key([0, 3, 1, 4], num_exams=2) == gene_key([0, 4, 1, 3], num_exams=2)
+    assert gene_key([0, 3, 1, 4], num_exams=2) != gene_key([1, 3, 0, 4], num_exams=2)
+
+
+def test_only_evaluations_are_counted():
+    calls = []
+    toolbox = counting_toolbox(calls)
+    cache = FitnessCache()
+    population = [creator.CacheIndividual(genes) for genes in ([1, 2], [1, 2], [3, 4])]
+    assert evaluate_invalid(population, toolbox, cache) == 2
+    assert calls == [[1, 2], [3, 4]]
+    assert [ind.fitness.values for ind in population] == [(3.0,), (3.0,), (7.0,)]
+
+    offspring = [creator.CacheIndividual(genes) for genes in ([3, 4], [5, 6])]
+    assert evaluate_invalid(offspring, toolbox, cache) == 1
+    assert calls[-1] == [5, 6]
+    assert offspring[0].fitness.values == (7.0,)
+    # without a cache every invalid individual is evaluated
+    assert evaluate_invalid([creator.CacheIndividual([1, 2]) for _ in range(3)], toolbox) == 3
@@ -0,0 +1,26 @@
+import os
+
+from conftest import make_optimizer
+
+
+def test_cache_is_reloaded(instance, tmp_path):
+    first = make_optimizer(instance, "dsatur", cache_dir=tmp_path)
+    second = make_optimizer(instance, "dsatur", cache_dir=tmp_path)
+    assert second.cache_key == first.cache_key
+    assert second.available_spatio_timeslots == first.available_spatio_timeslots
+    assert second.week2date_dict == first.week2date_dict
+    assert second.student2exams == first.student2exams
+    assert second.exam2students == first.exam2students
+    assert second.conflict_graph.exams == first.conflict_graph.exams
+    assert second.bindings == first.bindings
+
+
+def test_bindings_depend_on_available_rooms(instance, tmp_path):
+    make_optimizer(instance, "dsatur", cache_dir=tmp_path)
+    opt = make_optimizer(instance, cache_dir=tmp_path)
+    # without its largest room, the dsatur groups must be rebuilt for the smaller capacity
+    largest = max(instance["room_caps"], key=instance["room_caps"].get)
+    opt.available_spatio_timeslots = [spats for spats in opt.available_spatio_timeslots if spats[2] != largest]
+    assert opt.generate_bindings("dsatur") == opt.colour_bindings()
+    entry = os.listdir(opt.preprocess_cache.path(opt.cache_key))
+    assert len([name for name in entry if name.startswith("bindings_")]) == 2
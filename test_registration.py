@@ -0,0 +1,31 @@
+import pandas as pd
+
+from conftest import make_optimizer
+from registration import load_long_registration, load_wide_registration
+
+
+def write_long_registration(instance, path):
+    wide = pd.read_csv(instance["regis_datafile"], index_col="ID")
+    long = wide.stack().rename("registered").reset_index().rename(columns={"level_1": "exam"})
+    # registrations in no particular order, read in several chunks
+    long = long[long["registered"] != 0].sample(frac=1, random_state=0)
+    long[["ID", "exam"]].to_csv(path, index=False)
+
+
+def test_long_registration_matches_wide(instance, tmp_path):
+    path = tmp_path / "long.csv"
+    write_long_registration(instance, path)
+    assert load_long_registration(path, "ID", "exam", chunksize=100) == load_wide_registration(
+        instance["regis_datafile"], "ID", chunksize=100)
+
+
+def test_optimizer_reads_long_registration(instance, tmp_path):
+    path = tmp_path / "long.csv"
+    write_long_registration(instance, path)
+    wide = make_optimizer(instance)
+    long = make_optimizer({**instance, "regis_datafile": path}, exam_col="exam")
+    assert long.student2exams == wide.student2exams
+    assert long.exam2students == wide.exam2students
+    # exams come in order of first appearance, so the edges are compared as unordered pairs
+    assert {frozenset(edge) for edge in long.conflict_graph.edges()} == {
+        frozenset(edge) for edge in wide.conflict_graph.edges()}
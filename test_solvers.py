@@ -0,0 +1,45 @@
+import random
+from functools import partial
+
+import pytest
+
+from benchmark import KPI_COEF
+from conftest import make_optimizer
+from new import GAOptimizer
+from solvers import SimulatedAnnealing, TabuSearch, run_restarts
+
+# two exams among placeholders, like the chromosomes of main.Optimizer
+GENES = ["a", "b"] + ["no_exam_today"] * 18
+
+
+def early_exams(chromosome):
+    """the earlier the exams, the better"""
+    return -sum(i for i, gene in enumerate(chromosome) if gene != "no_exam_today"),
+
+
+def test_tabu_search_moves_past_placeholder_swaps():
+    random.seed(0)
+    solver = TabuSearch(max_evaluations=500, tenure=5, n_candidates=10)
+    best, fitness, _, reason = solver.run(random.sample(GENES, len(GENES)), early_exams)
+    assert reason == "evaluation budget spent"
+    assert fitness == early_exams(best) == (-1,)
+
+
+@pytest.mark.parametrize("solver", [SimulatedAnnealing, TabuSearch])
+def test_restarts_do_not_depend_on_the_workers(solver):
+    initial = partial(random.sample, GENES, len(GENES))
+    serial = run_restarts(solver(max_evaluations=200), initial, early_exams, n_restarts=3, seed=1, n_workers=1)
+    parallel = run_restarts(solver(max_evaluations=200), initial, early_exams, n_restarts=3, seed=1, n_workers=2)
+    assert [(best, fitness) for best, fitness, _, _ in serial] == [(best, fitness) for best, fitness, _, _ in parallel]
+
+
+@pytest.mark.parametrize("solver", ["annealing", "tabu"])
+@pytest.mark.parametrize("guided", [False, True])
+def test_solve_reports_the_fitness_of_its_timetable(instance, solver, guided):
+    opt = make_optimizer(instance, "pairs")
+    opt.solve(KPI_COEF, solver, seed=1, guided=guided, max_evaluations=300)
+    fitness = GAOptimizer.evaluate(opt.arranged_exams, opt.fixed_exams, opt.bindings, opt.available_spatio_timeslots,
+                                   opt.student2exams, opt.exam2students, opt.week2date_dict, KPI_COEF, opt.room_caps,
+                                   opt.conflict_graph)
+    assert opt.best_fitness == fitness[0]
+    assert max(log[-1]["best"] for log in opt.ga_log) == fitness[0]
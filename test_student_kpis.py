@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+from benchmark import KPI_COEF
+from conftest import make_optimizer
+from fast_eval import STUDENT_KPIS
+from new import GAOptimizer
+
+
+@pytest.mark.parametrize("bindings", [None, "pairs"])
+def test_student_kpis_sum_to_calculate_kpis(instance, bindings):
+    opt = make_optimizer(instance, bindings)
+    toolbox = opt.build_toolbox(KPI_COEF, "numpy")
+    random.seed(1)
+    for individual in toolbox.population(n=5):
+        exam2spats = opt.set_best(individual)
+        table = opt.student_kpi_table()
+        assert list(table["student id"]) == list(opt.student2exams)
+        kpis = GAOptimizer.calculate_kpis(exam2spats, opt.student2exams, opt.week2date_dict)
+        assert {kpi: table[kpi].sum() for kpi in STUDENT_KPIS} == {kpi: kpis[kpi] for kpi in STUDENT_KPIS}
+
+
+def test_student_kpi_table_needs_every_exam(instance):
+    opt = make_optimizer(instance)
+    random.seed(1)
+    exam2spats = opt.set_best(opt.build_toolbox(KPI_COEF, "numpy").population(n=1)[0])
+    exam2spats.pop(next(iter(opt.exam2students)))
+    with pytest.raises(ValueError, match="missing"):
+        opt.student_kpi_table(exam2spats)
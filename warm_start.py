@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+from deap import tools
+
+
+def read_timetable(path, rooms, day_col="day", slot_col="slot"):
+    """exam2spats of a timetable table as written by GAOptimizer.output_table - one row per day and slot, the cells
+    of the room columns holding exam codes
+
+    Every non-empty cell is taken for an exam, so the caller should ignore codes that are not exams (e.g. the marks
+    of unavailable rooms).
+    """
+    table = pd.read_csv(path)
+    exam2spats = {}
+    for day, slot, *cells in zip(table[day_col].tolist(), table[slot_col].tolist(),
+                                 *(table[room].tolist() for room in rooms)):
+        for room, cell in zip(rooms, cells):
+            if isinstance(cell, str) and cell.strip():
+                exam2spats[cell.strip()] = (day, slot, room)
+    return exam2spats
+
+
+def encode_timetable(optimizer, previous, constraints):
+    """integer chromosome reproducing the previous timetable (exam2spats) as closely as the current data allow
+
+    Exams keep their previous spatio-timeslot when it is still available, otherwise another room at the same day and
+    slot that fits their group. A gene follows the first exam of its group (the gene's exam and the exams bound to
+    it) with a previous slot. Exams with no usable previous slot, e.g. new modules, are placed by
+    constraints.complete (a SlotConstraints of the optimizer's evaluator); removed modules are ignored.
+    """
+    slots = optimizer.available_spatio_timeslots
+    slot_index = {spats: i for i, spats in enumerate(slots)}
+    time_slots = {}
+    for i, spats in enumerate(slots):
+        time_slots.setdefault(spats[:2], []).append(i)
+    group_of = {exam: [exam] for exam in optimizer.gene_exams}
+    for exam_k, exam_v in optimizer.bindings.items():
+        if exam_v in group_of:
+            group_of[exam_v].append(exam_k)
+    ev = constraints.evaluator
+
+    chromosome = [-1] * len(slots)
+    for gene, exam in enumerate(optimizer.gene_exams):
+        previous_slots = [previous[e] for e in group_of[exam] if e in previous]
+        slot = next((slot_index[spats] for spats in previous_slots
+                     if spats in slot_index and chromosome[slot_index[spats]] < 0), None)
+        if slot is None:
+            size = constraints.group_size[ev.exam_idx[exam]]
+            slot = next((i for spats in previous_slots for i in time_slots.get(spats[:2], [])
+                         if chromosome[i] < 0 and ev.slot_cap[i] >= size), None)
+        if slot is not None:
+            chromosome[slot] = gene
+    return constraints.complete(chromosome)
+
+
+def warm_population(individual_class, chromosome, n, indpb=0.05):
+    """the encoded chromosome and n - 1 perturbations of it (genes shuffled with probability indpb)"""
+    population = [individual_class(chromosome)]
+    for _ in range(n - 1):
+        population.append(tools.mutShuffleIndexes(individual_class(chromosome), indpb)[0])
+    return population
+
+
+class MovePenalty:
+    """Penalty of coef per exam arranged on another day or slot than in the previous timetable.
+
+    Only the exams that are in both timetables and not fixed count, a change of room at the same day and slot is not
+    a move.
+    """
+
+    def __init__(self, optimizer, previous, coef):
+        self.coef = coef
+        times = {}
+        self.slot_time = np.array([times.setdefault(spats[:2], len(times))
+                                   for spats in optimizer.available_spatio_timeslots], dtype=np.int64)
+        gene_of = {exam: gene for gene, exam in enumerate(optimizer.gene_exams)}
+        gene_of.update({exam_k: gene_of[exam_v] for exam_k, exam_v in optimizer.bindings.items()
+                        if exam_v in gene_of})
+        exams = [exam for exam in previous if exam in gene_of]
+        self.exam_gene = np.array([gene_of[exam] for exam in exams], dtype=np.int64)
+        # previous day and slot, -1 if it is no longer available
+        self.prev_time = np.array([times.get(previous[exam][:2], -1) for exam in exams], dtype=np.int64)
+
+    def moved(self, individual):
+        """number of exams moved"""
+        genes = np.asarray(individual)
+        position = np.empty_like(genes)
+        position[genes] = np.arange(len(genes))
+        return int(np.count_nonzero(self.slot_time[position[self.exam_gene]] != self.prev_time))
+
+    def apply(self, fitness, individual):
+        return (fitness[0] - self.coef * self.moved(individual),)
+
+
+def evaluate_penalized(individual, evaluate, penalty):
+    return penalty.apply(evaluate(individual), individual)
+
+
+def evaluate_batch_penalized(individuals, evaluate_batch, penalty):
+    return [penalty.apply(fitness, ind) for fitness, ind in zip(evaluate_batch(individuals), individuals)]